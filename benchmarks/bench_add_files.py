@@ -0,0 +1,28 @@
+"""Times adding 20 and 250 files to the queue with POST /queue/add/
+
+250 files take more than one batch, python-mpd2 doesn't queue that many commands at once.
+
+Start the fake MPD first: python fake_mpd.py --songs 300
+"""
+from common import argument_parser, summary, test_client, timed
+
+LST_QTY_FILES = [20, 250]
+REPEAT = 10
+
+
+def main() -> None:
+    arguments = argument_parser(__doc__.splitlines()[0]).parse_args()
+    with test_client(arguments.controller) as client:
+        for qty_files in LST_QTY_FILES:
+            lst_files = [{"file": f"Artist {i % 20}/Album {i % 7}/{i:03d} Song {i}.mp3"} for i in range(qty_files)]
+            items = {"files": lst_files, "at_position": 0, "start_playing": True, "clear_queue": True}
+            response = client.post("/queue/add/", json=items)
+            if response.status_code != 200:
+                raise SystemExit(f"Adding {qty_files} files failed with {response.status_code}: {response.text}")
+            lst_durations = timed(lambda: client.post("/queue/add/", json=items), REPEAT)
+            print(f"Adding {qty_files} files: {summary(lst_durations)}")
+        client.get("/queue/clear/")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Times GET /artists/detail/ with slow Discogs and Last.fm responses, and with one source failing
+
+Discogs and Last.fm are replaced by functions that sleep, so no network access or credentials are needed.
+Start the fake MPD first: python fake_mpd.py --songs 300
+"""
+import time
+
+from common import argument_parser, test_client
+
+DELAY_DISCOGS = 1.0
+DELAY_LASTFM = 1.2
+
+
+def main() -> None:
+    arguments = argument_parser(__doc__.splitlines()[0]).parse_args()
+    with test_client(arguments.controller) as client:
+        from routers import artists
+
+        def get_artist_image(name_artist: str) -> dict:
+            time.sleep(DELAY_DISCOGS)
+            return {"status_code": 200, "message": b""}
+
+        def get_artist_bio(name_artist: str) -> str:
+            time.sleep(DELAY_LASTFM)
+            return "A bio"
+
+        def fail(name_artist: str):
+            raise RuntimeError("network down")
+
+        artists.discogs.get_artist_image = get_artist_image
+        artists.lastfm.get_artist_bio = get_artist_bio
+        time_start = time.perf_counter()
+        response = client.get("/artists/detail/?name_artist=Artist 3")
+        print(f"Discogs {DELAY_DISCOGS} s and Last.fm {DELAY_LASTFM} s: {response.status_code} "
+              f"in {time.perf_counter() - time_start:.2f} s, errors {response.json()['errors']}")
+
+        artists.discogs.get_artist_image = fail
+        time_start = time.perf_counter()
+        response = client.get("/artists/detail/?name_artist=Artist 3")
+        print(f"Discogs failing: {response.status_code} "
+              f"in {time.perf_counter() - time_start:.2f} s, errors {response.json()['errors']}")
+
+
+if __name__ == "__main__":
+    main()
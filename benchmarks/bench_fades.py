@@ -0,0 +1,48 @@
+"""Checks the timing and number of requests of volume fades
+
+Start the fake servers first:
+    python fake_mpd.py --songs 300
+    python fake_snapserver.py --delay 0.3
+"""
+import time
+
+from common import argument_parser, snapcast_counts, test_client
+
+
+def wait_for_fades(client, timeout: float = 10) -> float:
+    time_start = time.perf_counter()
+    while client.get("/fades/").json() and time.perf_counter() - time_start < timeout:
+        time.sleep(0.01)
+    return time.perf_counter() - time_start
+
+
+def main() -> None:
+    arguments = argument_parser(__doc__.splitlines()[0]).parse_args()
+    with test_client(arguments.controller) as client:
+        client.get("/snapserver/groups/")
+        client.get("/fades/start/?target=mpd&volume=50&duration=0")
+        wait_for_fades(client)
+        client.get("/fades/start/?target=mpd&volume=10&duration=1&steps_per_second=10")
+        duration = wait_for_fades(client)
+        print(f"MPD fade 50 -> 10 over 1 s: took {duration:.2f} s, "
+              f"ended at {client.get('/system/status/').json().get('volume')}")
+
+        client.get("/fades/start/?target=snapcast_client&id_target=c3&volume=20&duration=0")
+        wait_for_fades(client)
+        counts_start = snapcast_counts()
+        client.get("/fades/start/?target=snapcast_client&id_target=c3&volume=80&duration=1&steps_per_second=20")
+        duration = wait_for_fades(client)
+        volume = client.get("/snapserver/clients/?id_group=g2").json()[0]["config"]["volume"]["percent"]
+        print(f"Snapcast client fade 20 -> 80 over 1 s at 20 steps a second: took {duration:.2f} s, "
+              f"ended at {volume} with {snapcast_counts()['tcp'] - counts_start['tcp']} requests")
+
+        client.get("/fades/start/?target=snapcast_group&id_target=g1&volume=0&duration=3")
+        time.sleep(1)
+        volume = client.get("/fades/cancel/?target=snapcast_group&id_target=g1").json()["volume"]
+        time.sleep(0.5)
+        print(f"Snapcast group fade cancelled at {volume}, "
+              f"group now at {client.get('/snapserver/group/?id_group=g1').json()['volume']}")
+
+
+if __name__ == "__main__":
+    main()
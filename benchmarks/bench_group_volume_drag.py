@@ -0,0 +1,42 @@
+"""Counts the Snapcast messages and time a group volume slider drag of 20 values takes
+
+Start the fake Snapcast server first: python fake_snapserver.py --delay 0.3
+"""
+import asyncio
+import time
+
+from common import argument_parser, controller_copy, snapcast_counts
+
+QTY_VALUES = 20
+INTERVAL = 0.01  # Seconds between the values of the drag
+
+
+async def run() -> None:
+    from snapcast.snapcast_control import SnapcastControl, group_volume
+
+    control = SnapcastControl("127.0.0.1")
+    await control.get_server()
+    counts_start = snapcast_counts()
+    time_start = time.perf_counter()
+
+    # Each value is awaited by its own caller, like the requests of a slider drag
+    async def set_volume(volume: int, delay: float) -> None:
+        await asyncio.sleep(delay)
+        await control.set_group_volume("g1", volume)
+
+    await asyncio.gather(*[set_volume(30 + i, i * INTERVAL) for i in range(QTY_VALUES)])
+    duration = time.perf_counter() - time_start
+    counts_end = snapcast_counts()
+    print(f"Drag of {QTY_VALUES} values took {duration:.2f} s, "
+          f"{counts_end['tcp'] - counts_start['tcp']} messages of which {counts_end['batch'] - counts_start['batch']} "
+          f"batches, ending at volume {group_volume(control.find_group('g1'))} (last requested {30 + QTY_VALUES - 1})")
+
+
+def main() -> None:
+    arguments = argument_parser(__doc__.splitlines()[0]).parse_args()
+    with controller_copy(arguments.controller):
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
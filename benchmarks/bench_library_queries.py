@@ -0,0 +1,40 @@
+"""Times the MPD lookups of MPDLibrary that are used while the library index isn't loaded
+
+Start the fake MPD first: python fake_mpd.py --songs 20000
+"""
+import asyncio
+import time
+
+from common import argument_parser, controller_copy
+
+REPEAT = 10
+
+
+async def measure(label: str, function) -> None:
+    await function()
+    time_start = time.perf_counter()
+    for _ in range(REPEAT):
+        await function()
+    print(f"{label}: {(time.perf_counter() - time_start) * 1000:.0f} ms for {REPEAT} lookups")
+
+
+async def run(port: int) -> None:
+    from mpd_client.mpd_library import MPDLibrary
+
+    # A library that was never started has no index, so every lookup goes to MPD
+    library = MPDLibrary(host="127.0.0.1", port=port)
+    await measure("get_song with artist", lambda: library.get_song("Song 1", "Artist 1"))
+    await measure("get_song of covers", lambda: library.get_song("Song 1", "Artist 1", is_cover=True))
+    await measure("get_album", lambda: library.get_album("Artist 3", "Album 3"))
+
+
+def main() -> None:
+    parser = argument_parser(__doc__.splitlines()[0])
+    parser.add_argument("--port-mpd", type=int, default=6600)
+    arguments = parser.parse_args()
+    with controller_copy(arguments.controller):
+        asyncio.run(run(arguments.port_mpd))
+
+
+if __name__ == "__main__":
+    main()
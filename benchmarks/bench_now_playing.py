@@ -0,0 +1,33 @@
+"""Times refreshing a now playing screen with GET /now-playing against the three separate endpoints
+
+Start the fake MPD first: python fake_mpd.py --songs 300
+"""
+import time
+
+from common import argument_parser, summary, test_client, timed
+
+REPEAT = 100
+
+
+def main() -> None:
+    arguments = argument_parser(__doc__.splitlines()[0]).parse_args()
+    with test_client(arguments.controller) as client:
+        client.get("/queue/clear/")
+        client.post("/queue/add-asset/?type_asset=album&name=Album 2&start_playing=true")
+        time.sleep(0.3)
+
+        def separate() -> None:
+            client.get("/system/status/")
+            client.get("/queue/current-song/")
+            client.get("/queue/current-cover/")
+
+        etag = client.get("/now-playing").headers["etag"]
+        print(f"now-playing: {summary(timed(lambda: client.get('/now-playing'), REPEAT))}")
+        print(f"now-playing, not modified: "
+              f"{summary(timed(lambda: client.get('/now-playing', headers={'If-None-Match': etag}), REPEAT))}")
+        print(f"status + current-song + current-cover: {summary(timed(separate, REPEAT))}")
+        client.get("/queue/clear/")
+
+
+if __name__ == "__main__":
+    main()
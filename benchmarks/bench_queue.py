@@ -0,0 +1,39 @@
+"""Times GET /queue/ for queues of 250 to 2000 songs
+
+Start the fake MPD first: python fake_mpd.py --songs 300
+"""
+import asyncio
+
+from mpd.asyncio import MPDClient
+
+from common import argument_parser, summary, test_client, timed
+
+QUEUE_LENGTHS = (250, 500, 1000, 2000)
+REPEAT = 5
+
+
+async def fill_queue(qty_songs: int, port: int) -> None:
+    mpd = MPDClient()
+    await mpd.connect("127.0.0.1", port)
+    lst_files = [song["file"] for song in await mpd.listallinfo() if "file" in song]
+    await mpd.clear()
+    for i in range(qty_songs):
+        await mpd.addid(lst_files[i % len(lst_files)])
+    mpd.disconnect()
+
+
+def main() -> None:
+    parser = argument_parser(__doc__.splitlines()[0])
+    parser.add_argument("--port-mpd", type=int, default=6600)
+    arguments = parser.parse_args()
+    with test_client(arguments.controller) as client:
+        for qty_songs in QUEUE_LENGTHS:
+            asyncio.run(fill_queue(qty_songs, arguments.port_mpd))
+            client.get("/queue/")
+            lst_durations = timed(lambda: client.get("/queue/"), REPEAT)
+            print(f"{qty_songs:5d} songs: {summary(lst_durations)}")
+        client.get("/queue/clear/")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Times building the library search index and searching, fuzzy matching and completing on it
+
+Runs on a synthetic library, no MPD server is needed.
+"""
+import random
+import time
+
+from common import argument_parser, controller_copy
+
+QTY_SONGS = 100000
+QTY_ARTISTS = 5000
+WORDS = ["love", "night", "blue", "fire", "dance", "rain", "heart", "road", "sun", "moon",
+         "dream", "river", "light", "gold", "stone", "wild", "city", "home", "time", "soul"]
+
+
+def name(qty_words: int) -> str:
+    return " ".join(random.choice(WORDS).capitalize() for _ in range(qty_words))
+
+
+def milliseconds(function, repeat: int) -> float:
+    time_start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - time_start) / repeat * 1000
+
+
+def run() -> None:
+    from mpd_client.mpd_index import LibraryIndex, song_record
+
+    random.seed(1)
+    lst_artists = [f"{name(2)} {i}" for i in range(QTY_ARTISTS)]
+    lst_records = []
+    for i in range(QTY_SONGS):
+        artist = lst_artists[i % QTY_ARTISTS]
+        album = f"{name(3)} {i // 12}"
+        song = {"file": f"{artist}/{album}/{i}.flac", "artist": artist, "albumartist": artist, "album": album,
+                "title": name(4), "time": 200, "duration": 200.0, "track": str(i % 12)}
+        lst_records.append(song_record(song))
+
+    index = LibraryIndex("127.0.0.1")
+    time_start = time.perf_counter()
+    index.build_from_records(lst_records)
+    print(f"Building the index of {QTY_SONGS} songs: {time.perf_counter() - time_start:.2f} s")
+
+    for field, text, starts_with in [("artist", "River Gold", False), ("album", "moon", False),
+                                     ("title", "dream river", False), ("title", "Dream", True)]:
+        duration = milliseconds(lambda: index.find_songs(field, text, starts_with=starts_with, limit=100), 20)
+        print(f"Search {field} {'starting with' if starts_with else 'containing'} '{text}', "
+              f"limit 100: {duration:.2f} ms")
+    for field, text in [("artist", "Rivr Gld 12"), ("title", "dreem rivr"), ("album", "moon")]:
+        duration = milliseconds(lambda: index.find_similar(field, text, limit=10), 10)
+        print(f"Fuzzy {field} '{text}': {duration:.2f} ms")
+    for field in ("artist", "album", "title"):
+        lst_durations = []
+        for text in ["r", "ri", "riv", "river g", "d", "the", "m", "moon moon"] * 50:
+            time_start = time.perf_counter()
+            index.complete(field, text, limit=10)
+            lst_durations.append((time.perf_counter() - time_start) * 1000)
+        lst_durations.sort()
+        print(f"Complete {field}: p99 {lst_durations[int(len(lst_durations) * 0.99)]:.3f} ms")
+
+
+def main() -> None:
+    arguments = argument_parser(__doc__.splitlines()[0]).parse_args()
+    with controller_copy(arguments.controller):
+        run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Times GET /queue/ while three clients drag group volume sliders against a slow Snapcast server
+
+The controller runs in uvicorn, so calls that block its event loop show up in the /queue/ latency.
+Start the fake servers first:
+    python fake_mpd.py --songs 300
+    python fake_snapserver.py --delay 0.3
+"""
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from common import ENVIRONMENT, argument_parser, controller_copy
+
+QTY_SLIDERS = 3
+
+
+async def queue_latencies(client: httpx.AsyncClient, repeat: int) -> list:
+    lst_durations = []
+    for _ in range(repeat):
+        time_start = time.perf_counter()
+        await client.get("/queue/")
+        lst_durations.append((time.perf_counter() - time_start) * 1000)
+        await asyncio.sleep(0.02)
+    return lst_durations
+
+
+async def drag_slider(client: httpx.AsyncClient, stop: asyncio.Event) -> None:
+    volume = 10
+    while not stop.is_set():
+        volume = 30 if volume == 10 else 10
+        await client.get(f"/snapserver/group/volume/?id_group=g1&volume={volume}")
+
+
+async def run(port: int, repeat: int) -> None:
+    # Keep-alive is off, so a blocked event loop can't break a reused connection
+    limits = httpx.Limits(max_keepalive_connections=0)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=120, limits=limits) as client:
+        for _ in range(50):
+            try:
+                await client.get("/queue/")
+                break
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+        await client.get("/snapserver/groups/")
+        lst_idle = await queue_latencies(client, repeat)
+        stop = asyncio.Event()
+        lst_tasks = [asyncio.create_task(drag_slider(client, stop)) for _ in range(QTY_SLIDERS)]
+        await asyncio.sleep(0.3)
+        lst_busy = await queue_latencies(client, repeat)
+        stop.set()
+        await asyncio.gather(*lst_tasks)
+    for label, lst_durations in (("Snapcast idle", lst_idle), (f"{QTY_SLIDERS} sliders dragging", lst_busy)):
+        print(f"/queue/ with {label}: median {statistics.median(lst_durations):.1f} ms, "
+              f"max {max(lst_durations):.1f} ms")
+
+
+def main() -> None:
+    parser = argument_parser(__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=5099, help="Port uvicorn serves the controller on")
+    parser.add_argument("--repeat", type=int, default=30, help="Number of /queue/ requests per measurement")
+    arguments = parser.parse_args()
+    with controller_copy(arguments.controller) as dir_copy:
+        process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(arguments.port), "--log-level", "warning"],
+            cwd=dir_copy, env={**os.environ, **ENVIRONMENT}, stdout=subprocess.DEVNULL,
+        )
+        try:
+            asyncio.run(run(arguments.port, arguments.repeat))
+        finally:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
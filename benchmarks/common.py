@@ -0,0 +1,86 @@
+"""Helpers shared by the benchmarks"""
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import urllib.request
+
+DIR_CONTROLLER = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "controller"))
+ENVIRONMENT = {
+    "HOST_MPD": "127.0.0.1",
+    "HOST_SNAPSERVER": "127.0.0.1",
+    "HOST_CONTROLLER": "127.0.0.1",
+    "PORT_CONTROLLER": "5080",
+}
+
+
+def argument_parser(description: str) -> argparse.ArgumentParser:
+    """An argument parser with the --controller option every benchmark takes"""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument(
+        "--controller", default=DIR_CONTROLLER,
+        help="The controller directory to benchmark, e.g. of an older checkout made with git worktree",
+    )
+    return parser
+
+
+@contextlib.contextmanager
+def controller_copy(dir_controller: str):
+    """Runs the controller from a temporary copy, so the files it writes in config/ stay out of the tree
+
+    Yields:
+        str: The directory of the copy, which is also the working directory and on sys.path
+    """
+    dir_temp = tempfile.mkdtemp()
+    dir_copy = os.path.join(dir_temp, "controller")
+    shutil.copytree(dir_controller, dir_copy, ignore=shutil.ignore_patterns("__pycache__"))
+    os.environ.update(ENVIRONMENT)
+    dir_previous = os.getcwd()
+    sys.path.insert(0, dir_copy)
+    os.chdir(dir_copy)
+    try:
+        yield dir_copy
+    finally:
+        os.chdir(dir_previous)
+        sys.path.remove(dir_copy)
+        shutil.rmtree(dir_temp, ignore_errors=True)
+
+
+@contextlib.contextmanager
+def test_client(dir_controller: str):
+    """A FastAPI TestClient of the controller app, started like uvicorn would"""
+    with controller_copy(dir_controller):
+        from fastapi.testclient import TestClient
+        import main
+
+        with TestClient(main.app) as client:
+            # Gives the startup tasks (library index, event hub, Snapcast connection) time to settle
+            time.sleep(1)
+            yield client
+
+
+def snapcast_counts(port_http: int = 1780) -> dict:
+    """The number of messages the fake Snapcast server received so far"""
+    request = urllib.request.Request(f"http://127.0.0.1:{port_http}/stats", data=b"{}")
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+def timed(function, repeat: int) -> list:
+    """Milliseconds each of the calls to a function took"""
+    lst_durations = []
+    for _ in range(repeat):
+        time_start = time.perf_counter()
+        function()
+        lst_durations.append((time.perf_counter() - time_start) * 1000)
+    return lst_durations
+
+
+def summary(lst_durations: list) -> str:
+    return (f"median {statistics.median(lst_durations):.1f} ms, max {max(lst_durations):.1f} ms, "
+            f"total {sum(lst_durations):.0f} ms over {len(lst_durations)}")
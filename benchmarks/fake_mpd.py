@@ -0,0 +1,338 @@
+"""A small in-memory MPD server to run the controller's benchmarks against
+
+It speaks enough of the MPD protocol for the controller: status, queue and library commands, filter expressions,
+idle, binary cover art responses and command lists. The library is generated: songs are spread over 20 artists
+with 7 albums each, plus a 'Various Artists' compilation. Every command can be delayed to mimic a slow server.
+
+Usage:
+    python fake_mpd.py --port 6600 --songs 20000 --delay 0
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import re
+import shlex
+
+from PIL import Image
+
+QTY_ARTISTS = 20
+QTY_ALBUMS = 7
+SIZE_CHUNK = 4096  # Bytes of cover art sent per albumart/readpicture response
+
+library: list = []
+cover: bytes = b""
+state = {"queue": [], "nextid": 1, "version": 1, "state": "stop", "song": None, "volume": 50}
+idlers: list = []  # Queues of the connections that are idling
+delay: float = 0.0
+
+
+def generate_library(qty_songs: int) -> list:
+    lst_songs = []
+    for i in range(qty_songs):
+        artist = f"Artist {i % QTY_ARTISTS}"
+        album = f"Album {i % QTY_ALBUMS}"
+        lst_songs.append({
+            "file": f"{artist}/{album}/{i:03d} Song {i}.mp3", "Last-Modified": "2023-01-01T00:00:00Z",
+            "Time": "200", "duration": "200.5", "Artist": artist, "AlbumArtist": artist, "Album": album,
+            "Title": f"Song {i}", "Track": str(i % 12), "Date": "1999", "Genre": "Rock",
+        })
+    for i in range(3):
+        lst_songs.append({
+            "file": f"Compilations/Hits/{i:02d} Hit {i}.mp3", "Last-Modified": "2023-01-01T00:00:00Z",
+            "Time": "200", "duration": "200.5", "Artist": f"Singer {i}", "AlbumArtist": "Various Artists",
+            "Album": "Hits", "Title": f"Hit {i}", "Track": str(i + 1), "Date": "2001", "Genre": "Pop",
+        })
+    return lst_songs
+
+
+def generate_cover() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (300, 300), (200, 60, 60)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def song_lines(song: dict, extra: dict = None) -> str:
+    return "".join(f"{key}: {value}\n" for key, value in {**song, **(extra or {})}.items())
+
+
+def queue_lines(start: int = 0, end: int = None) -> str:
+    return "".join(
+        song_lines(song, {"Pos": pos, "Id": id_song})
+        for pos, (id_song, song) in enumerate(state["queue"])
+        if pos >= start and (end is None or pos < end)
+    )
+
+
+def notify(*subsystems) -> None:
+    for queue in idlers:
+        queue.put_nowait(subsystems)
+
+
+def queue_changed() -> None:
+    state["version"] += 1
+    notify("playlist")
+
+
+def tag(song: dict, name: str) -> str:
+    return next((value for key, value in song.items() if key.lower() == name.lower()), "")
+
+
+def matches(args: list, exact: bool) -> tuple:
+    """The songs matching a filter expression, or a tag and value, and the arguments that follow it"""
+    if args and args[0].startswith("("):
+        conditions = re.findall(r"\((\w+) (==|!=|contains|starts_with) '((?:[^'\\]|\\.)*)'\)", args[0])
+
+        def is_match(song: dict) -> bool:
+            for name, operator, value in conditions:
+                value = value.replace("\\'", "'").replace("\\\\", "\\")
+                text = tag(song, name)
+                if operator == "==" and text != value:
+                    return False
+                if operator == "!=" and text == value:
+                    return False
+                if operator == "contains" and value.lower() not in text.lower():
+                    return False
+                if operator == "starts_with" and not text.lower().startswith(value.lower()):
+                    return False
+            return True
+
+        return [song for song in library if is_match(song)], args[1:]
+    name, value = args[0], args[1]
+    if exact:
+        return [song for song in library if tag(song, name) == value], args[2:]
+    return [song for song in library if value.lower() in tag(song, name).lower()], args[2:]
+
+
+def status() -> str:
+    queue = state["queue"]
+    dict_status = {
+        "volume": state["volume"], "repeat": 0, "random": 0, "single": 0, "consume": 0,
+        "playlist": state["version"], "playlistlength": len(queue), "mixrampdb": 0, "state": state["state"],
+    }
+    song = state["song"]
+    if song is not None and song < len(queue):
+        dict_status.update(song=song, songid=queue[song][0], elapsed="12.5", duration="200.5")
+        if song + 1 < len(queue):
+            dict_status.update(nextsong=song + 1, nextsongid=queue[song + 1][0])
+    return "".join(f"{key}: {value}\n" for key, value in dict_status.items())
+
+
+def ack(command: str, code: int, message: str) -> tuple:
+    return ("ACK", f"[{code}@0] {{{command}}} {message}")
+
+
+def execute(command: str, args: list):
+    """The response of a command: text, ('ACK', message) or ('BIN', header, bytes)"""
+    queue = state["queue"]
+    if command == "ping":
+        return ""
+    if command == "status":
+        return status()
+    if command == "stats":
+        return (f"artists: {QTY_ARTISTS}\nalbums: {QTY_ALBUMS}\nsongs: {len(library)}\nuptime: 100\n"
+                "db_playtime: 1000\ndb_update: 1700000000\nplaytime: 10\n")
+    if command == "currentsong":
+        if state["song"] is None or state["song"] >= len(queue):
+            return ""
+        id_song, song = queue[state["song"]]
+        return song_lines(song, {"Pos": state["song"], "Id": id_song})
+    if command == "playlist":
+        return "".join(f"{pos}:file: {song['file']}\n" for pos, (_, song) in enumerate(queue))
+    if command in ("playlistinfo", "plchanges"):
+        if command == "playlistinfo" and args:
+            if ":" in args[0]:
+                start, end = args[0].split(":")
+                return queue_lines(int(start), int(end) if end else None)
+            return queue_lines(int(args[0]), int(args[0]) + 1)
+        return queue_lines()
+    if command == "plchangesposid":
+        return "".join(f"cpos: {pos}\nId: {id_song}\n" for pos, (id_song, _) in enumerate(queue))
+    if command == "playlistid":
+        for pos, (id_song, song) in enumerate(queue):
+            if not args or int(args[0]) == id_song:
+                return song_lines(song, {"Pos": pos, "Id": id_song})
+        return ack(command, 50, "No such song") if args else ""
+    if command in ("find", "search"):
+        lst_songs, rest = matches(args, exact=command == "find")
+        if "window" in rest:
+            start, end = rest[rest.index("window") + 1].split(":")
+            lst_songs = lst_songs[int(start):int(end) if end else None]
+        return "".join(song_lines(song) for song in lst_songs)
+    if command in ("playlistfind", "playlistsearch"):
+        lst_songs, _ = matches(args, exact=command == "playlistfind")
+        set_files = {song["file"] for song in lst_songs}
+        return "".join(
+            song_lines(song, {"Pos": pos, "Id": id_song})
+            for pos, (id_song, song) in enumerate(queue)
+            if song["file"] in set_files
+        )
+    if command in ("findadd", "searchadd"):
+        lst_songs, rest = matches(args, exact=command == "findadd")
+        position = int(rest[rest.index("position") + 1]) if "position" in rest else len(queue)
+        for song in lst_songs:
+            queue.insert(position, (state["nextid"], song))
+            state["nextid"] += 1
+            position += 1
+        queue_changed()
+        return ""
+    if command == "listallinfo":
+        return "".join(song_lines(song) for song in library)
+    if command == "list":
+        if args[0].lower() == "artist":
+            return "".join(f"Artist: {artist}\n" for artist in sorted({song["Artist"] for song in library}))
+        text = ""
+        for album_artist in sorted({song["AlbumArtist"] for song in library}):
+            albums = sorted({song["Album"] for song in library if song["AlbumArtist"] == album_artist})
+            text += f"AlbumArtist: {album_artist}\n" + "".join(f"Album: {album}\n" for album in albums)
+        return text
+    if command == "addid":
+        song = next((song for song in library if song["file"] == args[0]), None)
+        if song is None:
+            return ack(command, 50, "No such directory")
+        position = int(args[1]) if len(args) > 1 else len(queue)
+        if position > len(queue):
+            return ack(command, 2, "Bad song index")
+        id_song = state["nextid"]
+        state["nextid"] += 1
+        queue.insert(position, (id_song, song))
+        queue_changed()
+        return f"Id: {id_song}\n"
+    if command == "deleteid":
+        pos = next((pos for pos, (id_song, _) in enumerate(queue) if id_song == int(args[0])), None)
+        if pos is None:
+            return ack(command, 50, "No such song")
+        del queue[pos]
+        queue_changed()
+        return ""
+    if command == "delete":
+        start, end = args[0].split(":")
+        del queue[int(start):int(end)]
+        queue_changed()
+        return ""
+    if command == "move":
+        start, end = args[0].split(":")
+        lst_moved = queue[int(start):int(end)]
+        del queue[int(start):int(end)]
+        queue[int(args[1]):int(args[1])] = lst_moved
+        queue_changed()
+        return ""
+    if command == "clear":
+        queue.clear()
+        state["song"] = None
+        queue_changed()
+        return ""
+    if command == "play":
+        state["song"] = int(args[0]) if args else (state["song"] or 0)
+        state["state"] = "play"
+        notify("player")
+        return ""
+    if command in ("pause", "stop"):
+        state["state"] = command
+        notify("player")
+        return ""
+    if command in ("next", "previous", "seekcur"):
+        notify("player")
+        return ""
+    if command == "setvol":
+        state["volume"] = int(args[0])
+        notify("mixer")
+        return ""
+    if command == "outputs":
+        return "outputid: 0\noutputname: icecast\nplugin: shout\noutputenabled: 1\n"
+    if command == "update":
+        notify("update")
+        return "updating_db: 1\n"
+    if command == "listplaylists":
+        return "playlist: Mix\nLast-Modified: 2023-01-01T00:00:00Z\n"
+    if command in ("albumart", "readpicture"):
+        offset = int(args[1])
+        header = f"size: {len(cover)}\n" + ("type: image/png\n" if command == "readpicture" else "")
+        return ("BIN", header, cover[offset:offset + SIZE_CHUNK])
+    return ack(command, 5, f'unknown command "{command}"')
+
+
+def encode(response) -> bytes:
+    if isinstance(response, str):
+        return response.encode() + b"OK\n"
+    if response[0] == "ACK":
+        return f"ACK {response[1]}\n".encode()
+    _, header, chunk = response
+    return header.encode() + f"binary: {len(chunk)}\n".encode() + chunk + b"\nOK\n"
+
+
+async def idle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, args: list) -> None:
+    queue = asyncio.Queue()
+    idlers.append(queue)
+    task_changed = asyncio.ensure_future(queue.get())
+    task_noidle = asyncio.ensure_future(reader.readline())
+    done, _ = await asyncio.wait({task_changed, task_noidle}, return_when=asyncio.FIRST_COMPLETED)
+    idlers.remove(queue)
+    if task_changed in done:
+        # The reader is used by the next command once the cancelled readline has finished
+        task_noidle.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task_noidle
+        set_wanted = set(args)
+        subsystems = [name for name in task_changed.result() if not set_wanted or name in set_wanted]
+        writer.write(("".join(f"changed: {name}\n" for name in subsystems) + "OK\n").encode())
+    else:
+        task_changed.cancel()
+        writer.write(b"OK\n")
+
+
+async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    writer.write(b"OK MPD 0.23.5\n")
+    lst_listed = None  # Commands of an open command list
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        parts = shlex.split(line.decode().rstrip("\n")) or [""]
+        command, args = parts[0], parts[1:]
+        if command == "idle":
+            await idle(reader, writer, args)
+        elif command == "noidle":
+            continue
+        elif command in ("command_list_begin", "command_list_ok_begin"):
+            lst_listed = []
+            continue
+        elif command == "command_list_end":
+            data = b""
+            for listed_command, listed_args in lst_listed:
+                response = execute(listed_command, listed_args)
+                if isinstance(response, tuple) and response[0] == "ACK":
+                    data += encode(response)
+                    break
+                data += encode(response)[:-3] + b"list_OK\n"
+            else:
+                data += b"OK\n"
+            lst_listed = None
+            writer.write(data)
+        elif lst_listed is not None:
+            lst_listed.append((command, args))
+            continue
+        else:
+            if delay:
+                await asyncio.sleep(delay)
+            writer.write(encode(execute(command, args)))
+        await writer.drain()
+
+
+async def main(port: int) -> None:
+    server = await asyncio.start_server(handle, "127.0.0.1", port)
+    print(f"Fake MPD with {len(library)} songs listening on 127.0.0.1:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=6600)
+    parser.add_argument("--songs", type=int, default=300, help="Number of generated songs")
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds every command is delayed")
+    arguments = parser.parse_args()
+    library = generate_library(arguments.songs)
+    cover = generate_cover()
+    delay = arguments.delay
+    asyncio.run(main(arguments.port))
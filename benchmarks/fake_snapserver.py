@@ -0,0 +1,155 @@
+"""A small in-memory Snapcast server to run the controller's benchmarks against
+
+It answers JSON-RPC requests and batches on the TCP control port and on HTTP (POST /jsonrpc, on the control port
+plus 75, like Snapcast's 1705/1780), and notifies the other TCP connections of changes like Snapcast does. Every
+request can be delayed to mimic a slow server. POST /stats returns the number of messages received, so benchmarks
+can count the requests they caused.
+
+Usage:
+    python fake_snapserver.py --port 1705 --delay 0.3
+"""
+import argparse
+import asyncio
+import json
+
+counts = {"tcp": 0, "http": 0, "batch": 0}
+writers: set = set()
+delay: float = 0.0
+
+
+def client(id_client: str, name: str, volume: int) -> dict:
+    return {
+        "id": id_client, "connected": True,
+        "host": {"name": name, "ip": "10.0.0.1", "mac": "00:00:00:00:00:00", "os": "Linux", "arch": "x86_64"},
+        "config": {"instance": 1, "latency": 0, "name": "", "volume": {"muted": False, "percent": volume}},
+        "lastSeen": {"sec": 1700000000, "usec": 0}, "snapclient": {"name": "Snapclient", "version": "0.27.0"},
+    }
+
+
+server = {
+    "groups": [
+        {"id": "g1", "name": "Living", "muted": False, "stream_id": "default",
+         "clients": [client("c1", "kitchen", 40), client("c2", "living", 60)]},
+        {"id": "g2", "name": "Upstairs", "muted": False, "stream_id": "default",
+         "clients": [client("c3", "bedroom", 20)]},
+    ],
+    "server": {"host": {"name": "snapserver"}, "snapserver": {"name": "Snapserver", "version": "0.27.0"}},
+    "streams": [{"id": "default", "status": "playing", "uri": {"raw": "pipe:///tmp/snapfifo"}, "properties": {}}],
+}
+
+
+def find_group(id_group: str) -> dict:
+    return next((group for group in server["groups"] if group["id"] == id_group), None)
+
+
+def find_client(id_client: str) -> dict:
+    return next(
+        (client for group in server["groups"] for client in group["clients"] if client["id"] == id_client), None
+    )
+
+
+def handle(request: dict) -> tuple:
+    """The response to a request and the notification it causes, or None"""
+    method, params, id_request = request.get("method"), request.get("params", {}), request.get("id")
+
+    def result(value: dict) -> dict:
+        return {"id": id_request, "jsonrpc": "2.0", "result": value}
+
+    def error(code: int, message: str) -> dict:
+        return {"id": id_request, "jsonrpc": "2.0", "error": {"code": code, "message": message}}
+
+    def notification(name: str, params: dict) -> dict:
+        return {"jsonrpc": "2.0", "method": name, "params": params}
+
+    if method == "Server.GetStatus":
+        return result({"server": server}), None
+    if method == "Group.GetStatus":
+        return result({"group": find_group(params["id"])}), None
+    if method == "Client.GetStatus":
+        return result({"client": find_client(params["id"])}), None
+    if method == "Client.SetVolume":
+        target = find_client(params["id"])
+        if target is None:
+            return error(-32603, "Client not found"), None
+        volume = target["config"]["volume"]
+        volume.update(params["volume"])
+        return result({"volume": volume}), notification("Client.OnVolumeChanged", {"id": params["id"], "volume": volume})
+    if method == "Client.SetName":
+        find_client(params["id"])["config"]["name"] = params["name"]
+        return result({"name": params["name"]}), notification("Client.OnNameChanged", params)
+    if method == "Group.SetMute":
+        find_group(params["id"])["muted"] = params["mute"]
+        return result({"mute": params["mute"]}), notification("Group.OnMute", params)
+    return error(-32601, "Method not found"), None
+
+
+def broadcast(lst_notifications: list, sender=None) -> None:
+    # Like Snapcast, the connection that made the change isn't notified
+    for writer in list(writers):
+        if writer is not sender:
+            for message in lst_notifications:
+                writer.write((json.dumps(message) + "\r\n").encode())
+
+
+async def process(payload, sender=None):
+    if delay:
+        await asyncio.sleep(delay)
+    if isinstance(payload, list):
+        counts["batch"] += 1
+        lst_handled = [handle(request) for request in payload]
+        broadcast([message for _, message in lst_handled if message is not None], sender)
+        return [response for response, _ in lst_handled]
+    response, message = handle(payload)
+    if message is not None:
+        broadcast([message], sender)
+    return response
+
+
+async def serve_tcp(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    writers.add(writer)
+
+    async def respond(payload) -> None:
+        writer.write((json.dumps(await process(payload, writer)) + "\r\n").encode())
+
+    try:
+        while line := await reader.readline():
+            counts["tcp"] += 1
+            # Requests are answered concurrently, each after the delay
+            asyncio.create_task(respond(json.loads(line)))
+    finally:
+        writers.discard(writer)
+
+
+async def serve_http(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    head = await reader.readuntil(b"\r\n\r\n")
+    lst_lines = head.split(b"\r\n")
+    length = next(int(line.split(b":")[1]) for line in lst_lines if line.lower().startswith(b"content-length"))
+    body = await reader.readexactly(length)
+    counts["http"] += 1
+    if b"/stats" in lst_lines[0]:
+        data = json.dumps(counts).encode()
+    else:
+        data = json.dumps(await process(json.loads(body))).encode()
+    writer.write(
+        b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: %d\r\nConnection: close\r\n\r\n"
+        % len(data) + data
+    )
+    await writer.drain()
+    writer.close()
+
+
+async def main(port: int) -> None:
+    server_tcp = await asyncio.start_server(serve_tcp, "127.0.0.1", port)
+    server_http = await asyncio.start_server(serve_http, "127.0.0.1", port + 75)
+    print(f"Fake Snapcast listening on 127.0.0.1:{port} (TCP) and 127.0.0.1:{port + 75} (HTTP)")
+    async with server_tcp, server_http:
+        await asyncio.gather(server_tcp.serve_forever(), server_http.serve_forever())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=1705)
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds every request is delayed")
+    arguments = parser.parse_args()
+    delay = arguments.delay
+    asyncio.run(main(arguments.port))
@@ -9,10 +9,13 @@ from dotenv import dotenv_values
 
 from routers import (
     mpd_system,
+    mpd_events,
     mpd_library,
     mpd_queue,
     mpd_playlists,
+    artists,
     snapserver,
+    fades,
     discogs,
     lastfm,
 )
@@ -25,14 +28,37 @@ config = {
 
 app = FastAPI()
 app.include_router(mpd_system.router)
+app.include_router(mpd_events.router)
 app.include_router(mpd_queue.router)
+app.include_router(mpd_queue.router_root)
 app.include_router(mpd_library.router)
 app.include_router(mpd_playlists.router)
+app.include_router(artists.router)
 app.include_router(snapserver.router)
+app.include_router(fades.router)
 app.include_router(lastfm.router)
 app.include_router(discogs.router)
 
 
+@app.on_event("startup")
+async def start_event_hub():
+    """Listens to MPD changes on a single connection, to push them to the UI clients"""
+    mpd_events.hub.start()
+
+
+@app.on_event("startup")
+async def start_library_index():
+    """Loads the MPD library in memory and keeps it and the cover cache in sync, so library requests don't need to
+    query MPD"""
+    mpd_library.library.start()
+
+
+@app.on_event("startup")
+async def start_snapcast_control():
+    """Connects to Snapcast's control port, to keep the state of its groups and clients in memory"""
+    snapserver.snapcontrol.start()
+
+
 @app.get("/", response_class=HTMLResponse)
 async def welcome_page(request: Request):
     content = """
@@ -0,0 +1,261 @@
+import asyncio
+from collections import OrderedDict
+import hashlib
+import logging
+import os
+import time
+
+logging.basicConfig(
+    format="%(levelname)s:\t%(asctime)s - %(module)s: %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+    level=logging.INFO,
+)
+logger = logging.getLogger(__name__)
+
+PATH_COVERS = "config/covers"
+MAX_MEMORY_BYTES = 64 * 1024 * 1024  # Size bound of the in-memory tier
+MISSING_TTL = 600  # Seconds a missing cover is remembered before MPD is asked again
+FILE_DATABASE_VERSION = "db_update"  # Holds the version of MPD's database the stored covers belong to
+
+
+class CoverCache:
+    """A two-tier cache for cover art: a size bound in-memory LRU backed by a content-addressed store on disk.
+
+    Covers are keyed by album directory. The disk store keeps each distinct image once, named after it's
+    SHA-256 hash, with small key files pointing to them. Covers that MPD doesn't have are remembered for a while,
+    so they aren't requested over and over again. All covers are dropped when MPD's database is updated.
+    """
+
+    def __init__(
+        self,
+        path: str = PATH_COVERS,
+        max_memory_bytes: int = MAX_MEMORY_BYTES,
+        missing_ttl: float = MISSING_TTL,
+    ) -> None:
+        self._path_objects = os.path.join(path, "objects")
+        self._path_keys = os.path.join(path, "keys")
+        self.__create_paths()
+        self.max_memory_bytes = max_memory_bytes
+        self.missing_ttl = missing_ttl
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._missing = {}  # Key -> time after which MPD is asked again
+        self._pending = {}  # Key -> task of a running fetch, so concurrent requests share it
+        self._db_update: int = None  # Version of MPD's database the covers were checked against
+
+    def __create_paths(self) -> None:
+        for path in [self._path_objects, self._path_keys]:
+            if not os.path.isdir(path):
+                os.makedirs(path)
+
+    def _file_key(self, key: str) -> str:
+        return os.path.join(self._path_keys, hashlib.sha1(key.encode()).hexdigest())
+
+    def _file_object(self, digest: str) -> str:
+        return os.path.join(self._path_objects, digest)
+
+    def _memory_get(self, key: str) -> bytes:
+        image = self._memory.get(key)
+        if image is not None:
+            self._memory.move_to_end(key)
+        return image
+
+    def _memory_put(self, key: str, image: bytes) -> None:
+        if len(image) > self.max_memory_bytes:
+            return
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key))
+        self._memory[key] = image
+        self._memory_bytes += len(image)
+        while self._memory_bytes > self.max_memory_bytes:
+            _, image_evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(image_evicted)
+
+    def _disk_get(self, key: str) -> bytes:
+        try:
+            with open(self._file_key(key), "r") as file:
+                digest = file.read().strip()
+            with open(self._file_object(digest), "rb") as file:
+                return file.read()
+        except OSError:
+            return None
+
+    def _disk_put(self, key: str, image: bytes) -> None:
+        digest = hashlib.sha256(image).hexdigest()
+        file_object = self._file_object(digest)
+        try:
+            if not os.path.isfile(file_object):
+                with open(file_object + ".tmp", "wb") as file:
+                    file.write(image)
+                os.replace(file_object + ".tmp", file_object)
+            with open(self._file_key(key), "w") as file:
+                file.write(digest)
+        except OSError as e:
+            logger.warning(f"Could not store cover of '{key}' on disk: {e}")
+
+    def _disk_invalidate(self, db_update: int) -> bool:
+        """Removes the stored covers when they were stored for another version of MPD's database
+
+        Returns:
+            bool: Whether the covers were removed
+        """
+        file_version = os.path.join(os.path.dirname(self._path_keys), FILE_DATABASE_VERSION)
+        try:
+            with open(file_version, "r") as file:
+                if int(file.read().strip()) == db_update:
+                    return False
+        except (OSError, ValueError):
+            pass
+        try:
+            for path in [self._path_keys, self._path_objects]:
+                for name in os.listdir(path):
+                    os.remove(os.path.join(path, name))
+            with open(file_version, "w") as file:
+                file.write(str(db_update))
+        except OSError as e:
+            logger.warning(f"Could not remove the covers stored on disk: {e}")
+        return True
+
+    def is_missing(self, key: str) -> bool:
+        time_expires = self._missing.get(key)
+        if time_expires is None:
+            return False
+        if time.monotonic() > time_expires:
+            del self._missing[key]
+            return False
+        return True
+
+    def _missing_put(self, key: str) -> None:
+        self._missing.pop(key, None)
+        time_now = time.monotonic()
+        self._missing[key] = time_now + self.missing_ttl
+        # All entries live equally long and are kept in the order they were added, so the expired ones are in front
+        for key_first, time_expires in list(self._missing.items()):
+            if time_expires > time_now:
+                break
+            del self._missing[key_first]
+
+    async def get(self, key: str) -> bytes:
+        """A cached cover, from memory or else from disk
+
+        Args:
+            key (str): The album directory
+
+        Returns:
+            bytes: The image, or None when it isn't cached
+        """
+        image = self._memory_get(key)
+        if image is None:
+            loop = asyncio.get_running_loop()
+            image = await loop.run_in_executor(None, self._disk_get, key)
+            if image is not None:
+                self._memory_put(key, image)
+        return image
+
+    async def put(self, key: str, image: bytes) -> None:
+        """Stores a cover, or remembers it is missing when the image is None
+
+        Args:
+            key (str): The album directory
+            image (bytes): The image
+        """
+        if image is None:
+            self._missing_put(key)
+            return
+        self._missing.pop(key, None)
+        self._memory_put(key, image)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._disk_put, key, image)
+
+    async def invalidate(self, db_update: int) -> None:
+        """Drops all covers when MPD's database was updated since they were stored, as artwork may have been replaced
+
+        Args:
+            db_update (int): The time of MPD's last database update, from it's stats
+        """
+        if db_update == self._db_update:
+            return
+        loop = asyncio.get_running_loop()
+        is_removed = await loop.run_in_executor(None, self._disk_invalidate, db_update)
+        self._db_update = db_update
+        if is_removed:
+            self._memory.clear()
+            self._memory_bytes = 0
+            self._missing.clear()
+            logger.info("MPD's database was updated, dropped the cached covers")
+
+    async def get_or_fetch(self, key: str, fetch) -> bytes:
+        """A cover from the cache, fetching and storing it on a miss
+
+        Args:
+            key (str): The album directory
+            fetch (callable): Coroutine function returning the image, or None if there is none
+
+        Returns:
+            bytes: The image, or None when there is no cover
+        """
+        if self.is_missing(key):
+            return None
+        image = await self.get(key)
+        if image is not None:
+            return image
+        if not self.is_fetching(key):
+            self.start_fetch(key, fetch)
+        return await self.wait_for_fetch(key)
+
+    def is_fetching(self, key: str) -> bool:
+        return key in self._pending
+
+    async def wait_for_fetch(self, key: str) -> bytes:
+        """The result of the fetch of a cover that is running
+
+        Args:
+            key (str): The album directory
+
+        Returns:
+            bytes: The image, or None when there is no cover
+        """
+        # Shielded, a request that is cancelled while waiting doesn't stop the fetch the other requests wait for
+        return await asyncio.shield(self._pending[key])
+
+    def start_fetch(self, key: str, fetch) -> asyncio.Task:
+        """Fetches a cover in a task of it's own and stores the result, concurrent requests for the cover wait for
+        that task with wait_for_fetch() instead of fetching it too
+
+        The task isn't owned by any of the requests, so it completes when the request that started it is cancelled.
+
+        Args:
+            key (str): The album directory
+            fetch (callable): Coroutine function returning the image, or None if there is none
+
+        Returns:
+            asyncio.Task: The fetch, resulting in the image or None when there is no cover
+        """
+        task = asyncio.create_task(self.__fetch(key, fetch))
+        self._pending[key] = task
+        # Retrieves the error, so it isn't reported when no request waited for the fetch, fetch() logs it instead
+        task.add_done_callback(lambda task: task.cancelled() or task.exception())
+        return task
+
+    async def __fetch(self, key: str, fetch) -> bytes:
+        try:
+            image = await fetch()
+            await self.put(key, image)
+            return image
+        finally:
+            del self._pending[key]
+
+
+_cover_cache: CoverCache = None
+
+
+def get_cover_cache() -> CoverCache:
+    """The cover art cache shared by all MPD clients
+
+    Returns:
+        CoverCache: The cover art cache
+    """
+    global _cover_cache
+    if _cover_cache is None:
+        _cover_cache = CoverCache()
+    return _cover_cache
@@ -0,0 +1,61 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import logging
+
+from PIL import Image, UnidentifiedImageError
+
+logging.basicConfig(
+    format="%(levelname)s:\t%(asctime)s - %(module)s: %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+    level=logging.INFO,
+)
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZES = (64, 128, 256, 512)  # Sizes in pixels of the longest side that can be requested
+THUMBNAIL_FORMATS = {"jpeg": "image/jpeg", "webp": "image/webp"}
+THUMBNAIL_QUALITY = 85
+QTY_WORKERS = 2
+
+# Pillow releases the GIL while decoding, resizing and encoding, so threads keep the work off the event loop
+_executor = ThreadPoolExecutor(max_workers=QTY_WORKERS, thread_name_prefix="thumbnails")
+
+
+def create_thumbnail(image: bytes, size: int, image_format: str) -> bytes:
+    """Scales an image down so it's longest side fits the size
+
+    Args:
+        image (bytes): The original image
+        size (int): The maximum width and height in pixels
+        image_format (str): The format of the thumbnail, one of THUMBNAIL_FORMATS
+
+    Returns:
+        bytes: The thumbnail, or None when the original couldn't be read
+    """
+    try:
+        with Image.open(BytesIO(image)) as original:
+            # Lets the JPEG decoder skip detail that is lost anyway
+            original.draft("RGB", (size, size))
+            thumbnail = original.convert("RGB")
+        thumbnail.thumbnail((size, size), Image.LANCZOS)
+        output = BytesIO()
+        thumbnail.save(output, format=image_format.upper(), quality=THUMBNAIL_QUALITY)
+    except (UnidentifiedImageError, OSError, ValueError) as e:
+        logger.warning(f"Could not create a {size} pixel {image_format} thumbnail: {e}")
+        return None
+    return output.getvalue()
+
+
+async def get_thumbnail(image: bytes, size: int, image_format: str) -> bytes:
+    """Creates a thumbnail in the worker pool
+
+    Args:
+        image (bytes): The original image
+        size (int): The maximum width and height in pixels
+        image_format (str): The format of the thumbnail, one of THUMBNAIL_FORMATS
+
+    Returns:
+        bytes: The thumbnail, or None when the original couldn't be read
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, create_thumbnail, image, size, image_format)
@@ -1,4 +1,5 @@
 import logging
+from datetime import datetime, timedelta, timezone
 from dateutil import parser
 
 logging.basicConfig(
@@ -32,6 +33,20 @@ def rename_song_dict_keys(data):
         # Handle other types or raise an exception if needed
         raise ValueError("Input data must be a list of dictionaries or a single dictionary.")
 
+def parse_mpd_datetime(value: str) -> datetime:
+    """Parses the timestamps MPD returns, without the costly dateutil parser for MPD's usual format
+
+    Args:
+        value (str): A timestamp like '2023-01-01T12:00:00Z'
+
+    Returns:
+        datetime: A timezone aware datetime
+    """
+    try:
+        return datetime.strptime(value, '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc)
+    except ValueError:
+        return parser.parse(value)
+
 def type_library(data):
     """Converts datatypes to their actual datatypes instead of the strings MPD returns
 
@@ -80,7 +95,7 @@ def type_library_dict(data) -> dict:
         if key in data.keys():
             logger.debug(f"Converting {key} of {data['file']} to datetime.")
             try:
-                data[key] =  parser.parse(data[key])
+                data[key] = parse_mpd_datetime(data[key])
             except TypeError:
                 logger.error(f"Could not convert {key} of {data['file']} to datetime.")
     for key in lst_float:
@@ -92,6 +107,66 @@ def type_library_dict(data) -> dict:
                 logger.error(f"Could not convert {key} of {data['file']} to float.")
     return data
 
+def _mpd_bool(value: str) -> bool:
+    return value == '1'
+
+# Conversions of the status values that aren't strings
+STATUS_TYPES = {
+    'volume': int, 'playlist': int, 'playlistlength': int,
+    'song': int, 'songid': int, 'nextsong': int, 'nextsongid': int,
+    'repeat': _mpd_bool, 'random': _mpd_bool, 'single': _mpd_bool, 'consume': _mpd_bool,
+    'elapsed': float, 'duration': float, 'mixrampdb': float,
+}
+
+def type_status_dict(status: dict) -> dict:
+    """Converts the values of MPD's status to their actual datatypes
+
+    Args:
+        status (dict): MPD server status as returned by MPD
+
+    Returns:
+        dict: MPD server status with converted data types
+    """
+    for key, value in status.items():
+        convert = STATUS_TYPES.get(key)
+        if convert is not None:
+            status[key] = convert(value)
+    return status
+
+def type_stats_dict(dict_stats: dict) -> dict:
+    """Converts the values of MPD's statistics to their actual datatypes, with durations as readable text
+
+    Args:
+        dict_stats (dict): MPD server statistics as returned by MPD
+
+    Returns:
+        dict: MPD server statistics with converted data types
+    """
+    lst_int = ['artists', 'albums', 'songs']
+    for item in lst_int:
+        if item in dict_stats.keys():
+            dict_stats[item] = int(dict_stats[item])
+    lst_time_elapsed = ['db_playtime', 'uptime', 'playtime']
+    for item in lst_time_elapsed:
+        if item in dict_stats.keys():
+            dict_stats[item] = str(timedelta(seconds=int(dict_stats[item])))
+    if 'db_update' in dict_stats.keys():
+        dict_stats['db_update'] = datetime.fromtimestamp(int(dict_stats['db_update']))
+    return dict_stats
+
+def type_outputs(outputs: list) -> list:
+    """Converts the enabled flag of MPD's outputs to a boolean
+
+    Args:
+        outputs (list): Output dictionaries as returned by MPD
+
+    Returns:
+        list: Output dictionaries with converted data types
+    """
+    for output in outputs:
+        output['outputenabled'] = (True if output['outputenabled'] == "1" else False)
+    return outputs
+
 def nest_artist_album(list_dict_files):
     """
     Nesting of files within a hierarchy of artists and their albums
@@ -0,0 +1,183 @@
+from bisect import bisect_left
+from collections import Counter
+from itertools import chain
+import heapq
+
+MIN_SIMILARITY = 0.3  # Minimal similarity score of fuzzy matches
+COMPLETION_PREFIX_LENGTH = 2  # Prefixes up to this length have their completions precomputed
+COMPLETION_CACHE_SIZE = 25  # Number of completions precomputed for each short prefix
+
+
+def trigrams(text: str, padded: bool = False) -> set:
+    """The set of 3 character sequences in a text
+
+    Args:
+        text (str): The text to split in trigrams
+        padded (bool, optional): Pad the text with spaces, so the start and end of a word weigh in. Defaults to False.
+
+    Returns:
+        set: Trigrams of the text
+    """
+    if padded:
+        text = "  " + text + " "
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+class TagSearchIndex:
+    """Substring and prefix lookups on the values of a single tag.
+
+    Each distinct casefolded value is stored once with the positions of the songs that have it. Substring
+    matches are narrowed down with a trigram index before being verified, prefix matches use binary search on
+    the sorted values. The same (padded) trigrams are used to rank values by their similarity to a misspelled
+    text. Completions, ranked by the number of songs, are precomputed for the shortest prefixes because those
+    match the most values.
+    """
+
+    def __init__(self) -> None:
+        self._keys: list = []  # Casefolded distinct tag values
+        self._names: list = []  # Distinct tag values as they were first encountered
+        self._songs: list = []  # Song positions per distinct tag value
+        self._qty_trigrams: list = []  # Number of padded trigrams per distinct tag value
+        self._trigrams: dict = {}  # Trigram -> positions in _keys
+        self._sorted: list = []  # (casefolded value, position in _keys), sorted for prefix searches
+        self._completions: dict = {}  # Short prefix -> positions in _keys, most songs first
+
+    @classmethod
+    def build(cls, values) -> "TagSearchIndex":
+        """Builds the index from the tag values of all songs
+
+        Args:
+            values (iterable): A tag value, a list of values for tags that occur more than once, or None for each
+                song, in the order of the songs
+
+        Returns:
+            TagSearchIndex: The search index of the tag
+        """
+        index = cls()
+        dict_key_ids = {}
+        for idx_song, song_values in enumerate(values):
+            if song_values is None:
+                continue
+            for value in [song_values] if isinstance(song_values, str) else song_values:
+                key = value.casefold()
+                id_key = dict_key_ids.get(key)
+                if id_key is None:
+                    id_key = dict_key_ids[key] = len(index._keys)
+                    index._keys.append(key)
+                    index._names.append(value)
+                    index._songs.append([])
+                    set_trigrams = trigrams(key, padded=True)
+                    index._qty_trigrams.append(len(set_trigrams))
+                    for trigram in set_trigrams:
+                        index._trigrams.setdefault(trigram, []).append(id_key)
+                lst_songs = index._songs[id_key]
+                # A value that occurs twice in a song is counted once
+                if len(lst_songs) == 0 or lst_songs[-1] != idx_song:
+                    lst_songs.append(idx_song)
+        index._sorted = sorted((key, id_key) for id_key, key in enumerate(index._keys))
+        index._build_completions()
+        return index
+
+    def _rank(self, lst_ids: list, limit: int) -> list:
+        """Orders value positions by their number of songs, keeping alphabetical order for ties"""
+        return heapq.nlargest(limit, lst_ids, key=lambda id_key: len(self._songs[id_key]))
+
+    def _build_completions(self) -> None:
+        dict_prefix_ids = {}
+        for key, id_key in self._sorted:
+            for length in range(1, min(len(key), COMPLETION_PREFIX_LENGTH) + 1):
+                dict_prefix_ids.setdefault(key[:length], []).append(id_key)
+        self._completions = {
+            prefix: self._rank(lst_ids, COMPLETION_CACHE_SIZE)
+            for prefix, lst_ids in dict_prefix_ids.items()
+        }
+
+    def _ids_containing(self, text: str) -> list:
+        if len(text) < 3:
+            return [id_key for id_key, key in enumerate(self._keys) if text in key]
+        lst_postings = []
+        for trigram in trigrams(text):
+            posting = self._trigrams.get(trigram)
+            if posting is None:
+                return []
+            lst_postings.append(posting)
+        lst_postings.sort(key=len)
+        candidates = set(lst_postings[0])
+        for posting in lst_postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                return []
+        return [id_key for id_key in candidates if text in self._keys[id_key]]
+
+    def _ids_starting_with(self, text: str) -> list:
+        lst_ids = []
+        i = bisect_left(self._sorted, (text,))
+        while i < len(self._sorted) and self._sorted[i][0].startswith(text):
+            lst_ids.append(self._sorted[i][1])
+            i += 1
+        return lst_ids
+
+    def search(self, text: str, starts_with: bool = False, limit: int = None) -> list:
+        """Positions of the songs with a tag value that contains (or starts with) a text, ignoring case
+
+        Args:
+            text (str): The text to look for
+            starts_with (bool, optional): Only match values starting with the text. Defaults to False.
+            limit (int, optional): The maximum number of songs returned. Defaults to no limit.
+
+        Returns:
+            list: Song positions, in library order
+        """
+        text = text.casefold()
+        if starts_with:
+            lst_ids = self._ids_starting_with(text)
+        else:
+            lst_ids = self._ids_containing(text)
+        # Songs with several values matching the text are found once
+        set_idx = {idx for id_key in lst_ids for idx in self._songs[id_key]}
+        if limit is None:
+            return sorted(set_idx)
+        return heapq.nsmallest(limit, set_idx)
+
+    def similar(self, text: str, limit: int = 10, min_score: float = MIN_SIMILARITY) -> list:
+        """Tag values ranked by their trigram similarity to a (possibly misspelled) text
+
+        Args:
+            text (str): The text to compare with
+            limit (int, optional): The maximum number of values returned. Defaults to 10.
+            min_score (float, optional): The minimal similarity of the values returned. Defaults to MIN_SIMILARITY.
+
+        Returns:
+            list: Dictionaries with the tag value, it's similarity score between 0 and 1 and number of songs
+        """
+        set_trigrams = trigrams(text.casefold(), padded=True)
+        qty_query = len(set_trigrams)
+        counts = Counter(
+            chain.from_iterable(self._trigrams.get(trigram, ()) for trigram in set_trigrams)
+        )
+        scores = (
+            (2 * qty_shared / (qty_query + self._qty_trigrams[id_key]), id_key)
+            for id_key, qty_shared in counts.items()
+        )
+        top = heapq.nlargest(limit, (item for item in scores if item[0] >= min_score))
+        return [
+            {"name": self._names[id_key], "score": round(score, 3), "qty_songs": len(self._songs[id_key])}
+            for score, id_key in top
+        ]
+
+    def complete(self, text: str, limit: int = 10) -> list:
+        """Tag values starting with a text, the values with the most songs first
+
+        Args:
+            text (str): The start of the tag value
+            limit (int, optional): The maximum number of values returned. Defaults to 10.
+
+        Returns:
+            list: Tag values
+        """
+        text = text.casefold()
+        if len(text) <= COMPLETION_PREFIX_LENGTH and limit <= COMPLETION_CACHE_SIZE:
+            lst_ids = self._completions.get(text, [])[:limit]
+        else:
+            lst_ids = self._rank(self._ids_starting_with(text), limit)
+        return [self._names[id_key] for id_key in lst_ids]
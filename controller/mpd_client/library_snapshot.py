@@ -0,0 +1,139 @@
+import logging
+import os
+
+import pyarrow as pa
+
+logging.basicConfig(
+    format="%(levelname)s:\t%(asctime)s - %(module)s: %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+    level=logging.INFO,
+)
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = "2"
+# Arrow types of the song fields that aren't strings
+FIELD_TYPES = {
+    "last-modified": pa.timestamp("s", tz="UTC"),
+    "time": pa.int64(),
+    "duration": pa.float64(),
+}
+OTHER_TYPE = pa.map_(pa.string(), pa.list_(pa.string()))  # Type of the field with a song's other tags
+
+
+class LibrarySnapshot:
+    """A columnar on-disk copy of the library index, so a restart doesn't need a full MPD database dump.
+
+    The snapshot is tagged with MPD's db_update time and only used when MPD reports the same value. Each field is a
+    column, except for tags that occur more than once in a song. Those are stored with the song's other tags in the
+    field_other column, which maps tags to their values and is left out when a song has none.
+    """
+
+    def __init__(self, file_path: str, fields: tuple, field_other: str = None) -> None:
+        self._file = file_path
+        self._fields = fields
+        self._idx_fields = {field: idx for idx, field in enumerate(fields)}
+        self._idx_other = None if field_other is None else fields.index(field_other)
+        self.__create_path()
+
+    def __create_path(self) -> None:
+        path = os.path.dirname(self._file)
+        if path != "" and not os.path.isdir(path):
+            os.makedirs(path)
+
+    def _schema(self, db_update: int) -> pa.Schema:
+        return pa.schema(
+            [
+                pa.field(field, OTHER_TYPE if idx == self._idx_other else FIELD_TYPES.get(field, pa.string()))
+                for idx, field in enumerate(self._fields)
+            ],
+            metadata={"db_update": str(db_update), "version": SNAPSHOT_VERSION},
+        )
+
+    def _pack(self, record: tuple) -> tuple:
+        """Moves the tags that occur more than once from their columns to the other tags"""
+        lst_values = list(record)
+        lst_other = [
+            (key, list(value) if isinstance(value, tuple) else [str(value)])
+            for key, value in record[self._idx_other] or ()
+        ]
+        for idx, value in enumerate(record):
+            if isinstance(value, tuple) and idx != self._idx_other:
+                lst_other.append((self._fields[idx], list(value)))
+                lst_values[idx] = None
+        lst_values[self._idx_other] = lst_other or None
+        return tuple(lst_values)
+
+    def _unpack(self, record: tuple) -> tuple:
+        """Moves the tags that occur more than once back to their columns, the reverse of _pack"""
+        lst_values = list(record)
+        lst_other = []
+        for key, values in record[self._idx_other]:
+            value = values[0] if len(values) == 1 else tuple(values)
+            idx = self._idx_fields.get(key)
+            if idx is None:
+                lst_other.append((key, value))
+            else:
+                lst_values[idx] = value
+        lst_values[self._idx_other] = tuple(lst_other) or None
+        return tuple(lst_values)
+
+    def read(self, db_update: int) -> list:
+        """Reads the song records from the memory mapped snapshot
+
+        Args:
+            db_update (int): The db_update timestamp MPD currently reports
+
+        Returns:
+            list: Song records as tuples of field values, or None if there is no valid snapshot
+        """
+        if not os.path.isfile(self._file):
+            return None
+        try:
+            with pa.memory_map(self._file, "r") as source:
+                reader = pa.ipc.open_file(source)
+                metadata = reader.schema.metadata or {}
+                if metadata.get(b"version") != SNAPSHOT_VERSION.encode() or metadata.get(
+                    b"db_update"
+                ) != str(db_update).encode():
+                    logger.info("Library snapshot is outdated, the library will be reloaded from MPD")
+                    return None
+                table = reader.read_all()
+                lst_columns = [table.column(field).to_pylist() for field in self._fields]
+        except (pa.ArrowException, OSError) as e:
+            logger.warning(f"Could not read library snapshot {self._file}: {e}")
+            return None
+        lst_records = list(zip(*lst_columns))
+        if self._idx_other is not None:
+            lst_records = [
+                record if record[self._idx_other] is None else self._unpack(record) for record in lst_records
+            ]
+        return lst_records
+
+    def write(self, records: list, db_update: int) -> None:
+        """Writes the song records to the snapshot, replacing the previous snapshot when done
+
+        Args:
+            records (list): Song records as tuples of field values
+            db_update (int): The db_update timestamp MPD reported when the records were loaded
+        """
+        schema = self._schema(db_update=db_update)
+        file_temp = self._file + ".tmp"
+        try:
+            if self._idx_other is not None:
+                records = [self._pack(record) for record in records]
+            columns = list(zip(*records)) if len(records) > 0 else [[] for _ in self._fields]
+            table = pa.Table.from_arrays(
+                [
+                    pa.array(column, type=schema.field(field).type)
+                    for field, column in zip(self._fields, columns)
+                ],
+                schema=schema,
+            )
+            with pa.OSFile(file_temp, "wb") as sink:
+                with pa.ipc.new_file(sink, schema) as writer:
+                    writer.write_table(table)
+            os.replace(file_temp, self._file)
+        except (pa.ArrowException, OSError, TypeError, ValueError) as e:
+            logger.warning(f"Could not write library snapshot {self._file}: {e}")
+            return
+        logger.info(f"Wrote {len(records)} songs to library snapshot {self._file}")
@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import time
+
+from mpd.asyncio import CommandError, ConnectionError
+
+from mpd_client.mpd_pool import ConnectionPool
+from utils.shared_per_server import shared_per_server
+
+logging.basicConfig(
+    format="%(levelname)s:\t%(asctime)s - %(module)s: %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+    level=logging.INFO,
+)
+logger = logging.getLogger(__name__)
+
+BINARY_COMMANDS = ("albumart", "readpicture")
+CHUNK_SIZE = 64 * 1024  # Requested with binarylimit, MPD falls back to 8 KiB chunks when it doesn't support it
+QTY_CONNECTIONS = 2  # Connections reserved for reading binaries, so covers don't hold up other commands
+TIMEOUT = 10  # Seconds to wait for a connection or a response line
+MAX_IDLE = 45  # Seconds a connection is reused, MPD closes connections idle for longer than it's connection_timeout (60)
+
+
+def _quote(argument: str) -> str:
+    """Quotes a command argument the way the MPD protocol expects"""
+    return '"' + argument.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+class MPDBinaryReader(ConnectionPool):
+    """Reads the binary responses of MPD's albumart and readpicture commands one chunk at a time.
+
+    python-mpd2 only hands over a binary when it has requested and joined all of it's chunks. This reader speaks
+    the protocol on raw connections instead, so each chunk can be passed on as soon as it arrives. It leases them
+    from a pool of it's own, connections are (reader, writer) tuples of asyncio streams.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int = 6600,
+        size: int = QTY_CONNECTIONS,
+        chunk_size: int = CHUNK_SIZE,
+    ) -> None:
+        super().__init__(host=host, port=port, size=size)
+        self.chunk_size = chunk_size
+
+    async def _readline(self, reader: asyncio.StreamReader) -> str:
+        line = await asyncio.wait_for(reader.readline(), TIMEOUT)
+        if not line.endswith(b"\n"):
+            raise ConnectionError(f"Connection to MPD server on {self.host}:{self.port} was closed")
+        return line[:-1].decode("utf-8")
+
+    async def _open(self) -> tuple:
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port), TIMEOUT
+            )
+        except (OSError, asyncio.TimeoutError):
+            logger.error(f"Failed to connect to MPD server on {self.host}:{self.port}")
+            raise ConnectionError(
+                f"Failed to connect to MPD server on {self.host}:{self.port}"
+            )
+        try:
+            greeting = await self._readline(reader)
+            if not greeting.startswith("OK MPD "):
+                raise ConnectionError(f"Unexpected greeting from MPD server: {greeting}")
+            writer.write(f"binarylimit {self.chunk_size}\n".encode())
+            line = await self._readline(reader)
+        except BaseException:
+            writer.close()
+            raise
+        if line.startswith("ACK"):
+            logger.info("MPD server doesn't support binarylimit, using it's default chunk size")
+        return reader, writer
+
+    def _close(self, connection: tuple) -> None:
+        _, writer = connection
+        writer.close()
+
+    def _is_open(self, connection: tuple) -> bool:
+        reader, _ = connection
+        return not reader.at_eof()
+
+    async def _is_healthy(self, connection: tuple, time_returned: float) -> bool:
+        return self._is_open(connection) and time.monotonic() - time_returned < MAX_IDLE
+
+    async def _request(self, connection: tuple, command: str, uri: str, offset: int) -> dict:
+        reader, writer = connection
+        writer.write(f"{command} {_quote(uri)} {offset}\n".encode("utf-8"))
+        await writer.drain()
+        dict_chunk = {}
+        while True:
+            line = await self._readline(reader)
+            if line == "OK":
+                return dict_chunk
+            if line.startswith("ACK"):
+                raise CommandError(line)
+            key, _, value = line.partition(": ")
+            if key == "binary":
+                binary = await asyncio.wait_for(reader.readexactly(int(value)), TIMEOUT)
+                await asyncio.wait_for(reader.readexactly(1), TIMEOUT)  # Newline that closes the binary
+                dict_chunk["binary"] = binary
+            else:
+                dict_chunk[key] = value
+
+    async def read_chunk(self, command: str, uri: str, offset: int = 0) -> dict:
+        """Reads a single chunk of a binary
+
+        Args:
+            command (str): Either 'albumart' (image in the song's directory) or 'readpicture' (image embedded in the song)
+            uri (str): The file specifier from the MPD library
+            offset (int, optional): Position in the binary the chunk starts at. Defaults to 0.
+
+        Raises:
+            ConnectionError: When the MPD server could not be reached
+
+        Returns:
+            dict: The total 'size' of the binary, the chunk as 'binary' and for readpicture the MIME 'type',
+            None if there is no such image
+        """
+        if command not in BINARY_COMMANDS:
+            raise ValueError(f"'{command}' is not a binary command")
+        try:
+            async with self.lease() as connection:
+                dict_chunk = await self._request(
+                    connection=connection, command=command, uri=uri, offset=offset
+                )
+        except CommandError as e:
+            logger.info(f"No {command} for {uri}: {e}")
+            return None
+        except (OSError, EOFError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+            raise ConnectionError(f"Reading {command} of {uri} failed: {e}")
+        if "binary" not in dict_chunk:
+            return None
+        dict_chunk["size"] = int(dict_chunk["size"])
+        return dict_chunk
+
+    async def stream(self, command: str, uri: str, first_chunk: dict = None):
+        """Yields the chunks of a binary as they are received
+
+        Args:
+            command (str): Either 'albumart' or 'readpicture'
+            uri (str): The file specifier from the MPD library
+            first_chunk (dict, optional): The chunk at offset 0, when it was already read. Defaults to None.
+
+        Raises:
+            ConnectionError: When the binary disappeared or the connection was lost before all chunks were read
+
+        Yields:
+            bytes: Consecutive chunks of the binary
+        """
+        dict_chunk = first_chunk or await self.read_chunk(command=command, uri=uri)
+        if dict_chunk is None:
+            return
+        size = dict_chunk["size"]
+        offset = 0
+        while True:
+            binary = dict_chunk["binary"]
+            offset += len(binary)
+            yield binary
+            if offset >= size or len(binary) == 0:
+                return
+            dict_chunk = await self.read_chunk(command=command, uri=uri, offset=offset)
+            if dict_chunk is None:
+                raise ConnectionError(f"The {command} of {uri} ended after {offset} of {size} bytes")
+
+    async def read(self, command: str, uri: str) -> bytes:
+        """Reads a whole binary
+
+        Args:
+            command (str): Either 'albumart' or 'readpicture'
+            uri (str): The file specifier from the MPD library
+
+        Returns:
+            bytes: The binary, None if there is no such image
+        """
+        lst_chunks = [chunk async for chunk in self.stream(command=command, uri=uri)]
+        return b"".join(lst_chunks) if len(lst_chunks) > 0 else None
+
+
+@shared_per_server
+def get_binary_reader(host: str, port: int = 6600) -> MPDBinaryReader:
+    """The binary reader shared by all MPD clients of a server
+
+    Args:
+        host (str): MPD server host
+        port (int, optional): MPD server port. Defaults to 6600.
+
+    Returns:
+        MPDBinaryReader: The binary reader for the server
+    """
+    return MPDBinaryReader(host=host, port=port)
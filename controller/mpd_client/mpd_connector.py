@@ -1,6 +1,9 @@
 import logging
 
-from mpd.asyncio import MPDClient, ConnectionError
+from mpd.asyncio import ConnectionError
+
+from mpd_client.mpd_events import get_event_hub
+from mpd_client.mpd_pool import get_pool
 
 logging.basicConfig(
     format="%(levelname)s:\t%(asctime)s - %(module)s: %(message)s",
@@ -11,32 +14,40 @@ logger = logging.getLogger(__name__)
 
 class MPDConnection:
     def __init__(self, host, port=6600) -> None:
-        self.mpd = MPDClient()
         self.host = host
         self.port = port
+        self.pool = get_pool(host=host, port=port)
+        self.hub = get_event_hub(host=host, port=port)
 
     async def connect(self) -> bool:
         """Connects to mpd server.
 
         :return: Boolean indicating if successfully connected to mpd server.
         """
-        if not self.is_connected:
-            try:
-                logger.info(f"Connecting to MPD server on {self.host}:{self.port}")
-                await self.mpd.connect(self.host, self.port)
-
-            except ConnectionError:
-                logger.error(
-                    f"Failed to connect to MPD server on {self.host}:{self.port}"
-                )
-                return False
+        try:
+            async with self.pool.lease():
+                pass
+        except ConnectionError:
+            return False
         return True
 
     @property
     def is_connected(self) -> bool:
-        return self.mpd.connected
+        return self.pool.is_connected
 
-    @property
-    async def command(self):
-        await self.connect()
-        return self.mpd
+    def lease(self):
+        """Leases a connection from the shared pool for the duration of a with block
+
+        Example:
+            async with self.lease() as mpd:
+                status = await mpd.status()
+        """
+        return self.pool.lease()
+
+    def invalidate(self, subsystems) -> None:
+        """Lets the cached MPD state know it is outdated after a command changed it
+
+        Args:
+            subsystems (iterable): Names of the MPD subsystems the command changed, like 'player' or 'playlist'
+        """
+        self.hub.invalidate(subsystems)
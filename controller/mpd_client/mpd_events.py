@@ -0,0 +1,359 @@
+import asyncio
+from contextlib import asynccontextmanager
+import logging
+import time
+
+from mpd.asyncio import MPDClient, CommandError, ConnectionError
+from mpd.base import MPDError
+
+from mpd_client import helper
+from mpd_client.mpd_pool import get_pool
+from utils.shared_per_server import shared_per_server
+
+logging.basicConfig(
+    format="%(levelname)s:\t%(asctime)s - %(module)s: %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+    level=logging.INFO,
+)
+logger = logging.getLogger(__name__)
+
+SUBSYSTEMS = ("player", "playlist", "mixer", "options", "update", "database", "stored_playlist", "output")
+# State parts that are retrieved again when a subsystem changes
+SUBSYSTEM_STATE = {
+    "player": ("status", "current_song"),
+    "playlist": ("status",),
+    "mixer": ("status",),
+    "options": ("status",),
+    "update": ("status",),
+    "database": ("statistics",),
+    "stored_playlist": ("playlists",),
+    "output": ("outputs",),
+}
+COALESCE_DELAY = 0.05  # Seconds changes are gathered before they are published as a single event
+SUBSCRIBER_QUEUE_SIZE = 100  # Events kept for a subscriber that is slow to receive them
+RECONNECT_DELAY = 5  # Seconds between attempts to restore the idle connection
+
+
+async def _result(command_result):
+    # Results of commands returning lists are only collected when awaited, asyncio.gather() takes them as plain futures
+    return await command_result
+
+
+def _interpolate_status(status: dict, seconds: float) -> dict:
+    """A copy of the status with the elapsed time moved forward while playing"""
+    status = dict(status)
+    if status.get("state") == "play" and "elapsed" in status:
+        elapsed = status["elapsed"] + seconds
+        if "duration" in status:
+            elapsed = min(elapsed, status["duration"])
+        status["elapsed"] = round(elapsed, 3)
+        if "time" in status:
+            status["time"] = f"{int(elapsed)}:{status['time'].partition(':')[2]}"
+    return status
+
+
+def _delta(previous, current):
+    """The keys of a dictionary that changed, with None for removed keys; other values are replaced as a whole"""
+    if not isinstance(previous, dict) or not isinstance(current, dict):
+        return current
+    dict_delta = {key: value for key, value in current.items() if previous.get(key) != value}
+    dict_delta.update({key: None for key in previous.keys() - current.keys()})
+    return dict_delta
+
+
+class MPDEventHub:
+    """Listens to all MPD subsystems on a single idle connection and publishes their changes to subscribers.
+
+    Changes arriving in quick succession are coalesced, the changed state is retrieved once and each subscriber
+    receives only what differs from the previous state. Subscribers are queues, so any number of WebSocket or
+    SSE clients share the same MPD connection. Listeners are coroutine functions that are called for subsystem
+    changes within the controller itself, and for all subsystems after (re)connecting, since changes might have
+    been missed in the meantime.
+
+    While the idle connection is up, the status and statistics are also served from memory. They are only
+    retrieved again after their subsystems changed, and the elapsed time is moved forward locally while playing.
+    """
+
+    def __init__(self, host: str, port: int = 6600) -> None:
+        self.host = host
+        self.port = port
+        self.pool = get_pool(host=host, port=port)
+        self._state: dict = {}
+        self._subscribers: set = set()
+        self._listeners: list = []  # (subsystems, coroutine function) tuples
+        self._changed: set = set()
+        self._event_changed: asyncio.Event = None
+        self._task_watch: asyncio.Task = None
+        self._task_publish: asyncio.Task = None
+        self._tasks_listeners: set = set()
+        self._is_listening = False
+        # State part -> (value, monotonic time it was retrieved); the status is typed, statistics are typed when read
+        # because their durations are moved forward first
+        self._cache: dict = {}
+        self._generation = 0  # Raised on each invalidation, so retrievals that overlap a change aren't cached
+
+    @property
+    def state(self) -> dict:
+        """The latest known state of all subsystems"""
+        return self._state
+
+    @property
+    def qty_subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def start(self) -> None:
+        """Starts listening to MPD in the background"""
+        if self._event_changed is None:
+            self._event_changed = asyncio.Event()
+        if self._task_watch is None or self._task_watch.done():
+            self._task_watch = asyncio.create_task(self._watch())
+        if self._task_publish is None or self._task_publish.done():
+            self._task_publish = asyncio.create_task(self._publish())
+
+    def add_listener(self, subsystems, callback) -> None:
+        """Calls a coroutine function when one of the subsystems changed
+
+        Args:
+            subsystems (iterable): Names of the SUBSYSTEMS to listen to
+            callback (callable): Coroutine function called with the set of changed subsystems
+        """
+        self._listeners.append((set(subsystems), callback))
+
+    def subscribe(self) -> asyncio.Queue:
+        """Registers a subscriber, which receives the full state first and events with changes after that
+
+        Returns:
+            asyncio.Queue: The queue the events are put in, to be handed back with unsubscribe
+        """
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        queue.put_nowait({"type": "state", "state": self._state})
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+
+    @asynccontextmanager
+    async def subscription(self):
+        """Subscribes for the duration of a with block
+
+        Example:
+            async with hub.subscription() as queue:
+                event = await queue.get()
+        """
+        queue = self.subscribe()
+        try:
+            yield queue
+        finally:
+            self.unsubscribe(queue)
+
+    def invalidate(self, subsystems) -> None:
+        """Drops the cached state of subsystems, for changes the controller made itself that idle reports later
+
+        Args:
+            subsystems (iterable): Names of the SUBSYSTEMS that changed
+        """
+        self._generation += 1
+        for subsystem in subsystems:
+            for part in SUBSYSTEM_STATE.get(subsystem, ()):
+                self._cache.pop(part, None)
+
+    def _notify(self, subsystems) -> None:
+        self.invalidate(subsystems)
+        self._changed.update(subsystems)
+        self._event_changed.set()
+
+    async def _watch(self) -> None:
+        while True:
+            client = MPDClient()
+            try:
+                await client.connect(self.host, self.port)
+                logger.info(f"Listening to changes of MPD on {self.host}:{self.port}")
+                self._is_listening = True
+                self._notify(SUBSYSTEMS)
+                async for subsystems in client.idle(SUBSYSTEMS):
+                    self._notify(subsystems)
+            except (MPDError, OSError) as e:
+                # Any MPD error, like a ProtocolError on a garbled response, ends the idle connection
+                logger.error(
+                    f"Lost idle connection to MPD server on {self.host}:{self.port}: {type(e).__name__}: {e}"
+                )
+            finally:
+                # Without idle there is no telling when the cache is outdated
+                self._is_listening = False
+                self.invalidate(SUBSYSTEMS)
+                if client.connected:
+                    client.disconnect()
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    async def _retrieve_raw(self, parts: set) -> dict:
+        """Retrieves state parts with a single pipelined command list, caching the status and statistics
+
+        A part MPD returns an error for is left out, the error is only raised when none of the parts could be retrieved.
+        """
+        dict_commands = {
+            "status": lambda mpd: mpd.status(),
+            "current_song": lambda mpd: mpd.currentsong(),
+            "statistics": lambda mpd: mpd.stats(),
+            "playlists": lambda mpd: mpd.listplaylists(),
+            "outputs": lambda mpd: mpd.outputs(),
+        }
+        lst_parts = [part for part in dict_commands if part in parts]
+        generation = self._generation
+        async with self.pool.lease() as mpd:
+            lst_results = await asyncio.gather(
+                *[_result(dict_commands[part](mpd)) for part in lst_parts], return_exceptions=True
+            )
+        dict_state = {}
+        lst_errors = []
+        for part, result in zip(lst_parts, lst_results):
+            if isinstance(result, CommandError):
+                logger.error(f"Could not retrieve the {part} of MPD on {self.host}:{self.port}: {result}")
+                lst_errors.append(result)
+            elif isinstance(result, BaseException):
+                # The connection failed, so none of the parts were retrieved
+                raise result
+            else:
+                dict_state[part] = result
+        if len(dict_state) == 0 and len(lst_errors) > 0:
+            raise lst_errors[0]
+        if self._is_listening and self._generation == generation:
+            time_retrieved = time.monotonic()
+            if "status" in dict_state:
+                self._cache["status"] = (helper.type_status_dict(dict(dict_state["status"])), time_retrieved)
+            if "statistics" in dict_state:
+                self._cache["statistics"] = (dict(dict_state["statistics"]), time_retrieved)
+        return dict_state
+
+    async def _retrieve(self, parts: set) -> dict:
+        """Retrieves state parts with their values converted to their actual datatypes"""
+        dict_state = await self._retrieve_raw(parts)
+        if "status" in dict_state:
+            dict_state["status"] = helper.type_status_dict(dict_state["status"])
+        if "current_song" in dict_state:
+            dict_state["current_song"] = helper.rename_song_dict_keys(dict_state["current_song"])
+        if "statistics" in dict_state:
+            dict_state["statistics"] = helper.type_stats_dict(dict_state["statistics"])
+        if "outputs" in dict_state:
+            dict_state["outputs"] = helper.type_outputs(dict_state["outputs"])
+        return dict_state
+
+    async def get_status(self) -> dict:
+        """MPD server status, from memory while nothing changed
+
+        Returns:
+            dict: MPD server status
+        """
+        cached = self._cache.get("status")
+        if cached is None:
+            dict_state = await self._retrieve_raw({"status"})
+            cached = (helper.type_status_dict(dict_state["status"]), time.monotonic())
+        status, time_retrieved = cached
+        return _interpolate_status(status, time.monotonic() - time_retrieved)
+
+    async def get_statistics(self) -> dict:
+        """MPD server statistics, from memory until the database changed
+
+        Returns:
+            dict: MPD server statistics
+        """
+        cached = self._cache.get("statistics")
+        if cached is None:
+            dict_state = await self._retrieve_raw({"statistics"})
+            cached = (dict_state["statistics"], time.monotonic())
+        dict_stats, time_retrieved = cached
+        dict_stats = dict(dict_stats)
+        seconds = int(time.monotonic() - time_retrieved)
+        if "uptime" in dict_stats:
+            dict_stats["uptime"] = int(dict_stats["uptime"]) + seconds
+        if "playtime" in dict_stats and self._cache.get("status", ({}, 0))[0].get("state") == "play":
+            dict_stats["playtime"] = int(dict_stats["playtime"]) + seconds
+        return helper.type_stats_dict(dict_stats)
+
+    def _broadcast(self, event: dict) -> None:
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Changes of a subscriber that lags behind are dropped, it is brought up to date with the full state
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"type": "state", "state": self._state})
+
+    async def _call_listener(self, callback, subsystems: set) -> None:
+        try:
+            await callback(subsystems)
+        except Exception:
+            logger.exception(f"Listener for {', '.join(sorted(subsystems))} changes failed")
+
+    def _call_listeners(self, subsystems: set) -> None:
+        # Run as tasks, so a slow listener (like reloading the library) doesn't hold up the events
+        for subsystems_listened, callback in self._listeners:
+            if subsystems_listened & subsystems:
+                task = asyncio.create_task(self._call_listener(callback, subsystems))
+                self._tasks_listeners.add(task)
+                task.add_done_callback(self._tasks_listeners.discard)
+
+    async def _queue_changes(self, version_previous: int) -> dict:
+        """The queue positions that changed since the previous playlist version, like MPDQueue.get_changes"""
+        status = self._state["status"]
+        version = status.get("playlist")
+        if version == version_previous:
+            return None
+        is_reset = version < version_previous
+        try:
+            async with self.pool.lease() as mpd:
+                lst_changes = await mpd.plchangesposid(0 if is_reset else version_previous)
+        except (MPDError, OSError) as e:
+            logger.error(f"Could not retrieve the queue changes of MPD on {self.host}:{self.port}: {e}")
+            return None
+        return {
+            "version": version,
+            "length": status.get("playlistlength", 0),
+            "reset": is_reset,
+            "changes": [
+                {"playlist_pos": int(change["cpos"]), "id": int(change["id"])} for change in lst_changes
+            ],
+        }
+
+    async def _publish(self) -> None:
+        while True:
+            await self._event_changed.wait()
+            await asyncio.sleep(COALESCE_DELAY)
+            self._event_changed.clear()
+            subsystems, self._changed = self._changed, set()
+            self._call_listeners(subsystems)
+            parts = {part for subsystem in subsystems for part in SUBSYSTEM_STATE.get(subsystem, ())}
+            try:
+                dict_state = await self._retrieve(parts)
+            except (MPDError, OSError) as e:
+                logger.error(f"Could not retrieve the changed state of MPD on {self.host}:{self.port}: {e}")
+                continue
+            version_previous = self._state.get("status", {}).get("playlist")
+            dict_changes = {}
+            for part, value in dict_state.items():
+                if self._state.get(part) != value:
+                    dict_changes[part] = _delta(self._state.get(part), value)
+                self._state[part] = value
+            if "playlist" in subsystems and version_previous is not None:
+                dict_queue = await self._queue_changes(version_previous)
+                if dict_queue is not None:
+                    dict_changes["queue"] = dict_queue
+            if len(dict_changes) > 0:
+                self._broadcast(
+                    {"type": "changed", "subsystems": sorted(subsystems), "changes": dict_changes}
+                )
+
+
+@shared_per_server
+def get_event_hub(host: str, port: int = 6600) -> MPDEventHub:
+    """The event hub shared by all MPD clients of a server
+
+    Args:
+        host (str): MPD server host
+        port (int, optional): MPD server port. Defaults to 6600.
+
+    Returns:
+        MPDEventHub: The event hub of the server
+    """
+    return MPDEventHub(host=host, port=port)
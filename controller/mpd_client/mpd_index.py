@@ -0,0 +1,324 @@
+import asyncio
+import logging
+import time
+
+from mpd_client import helper
+from mpd_client.library_search import TagSearchIndex
+from mpd_client.library_snapshot import LibrarySnapshot
+from mpd_client.mpd_events import get_event_hub
+from mpd_client.mpd_pool import get_pool
+from utils.shared_per_server import shared_per_server
+
+logging.basicConfig(
+    format="%(levelname)s:\t%(asctime)s - %(module)s: %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+    level=logging.INFO,
+)
+logger = logging.getLogger(__name__)
+
+# Tags with a fixed place in the song records, the other tags of a song follow them as OTHER_FIELD
+SONG_FIELDS = (
+    "file",
+    "last-modified",
+    "format",
+    "time",
+    "duration",
+    "artist",
+    "albumartist",
+    "album",
+    "title",
+    "track",
+    "disc",
+    "date",
+    "genre",
+    "composer",
+)
+# Keys of the song dictionaries served, named like helper.rename_song_dict_keys does
+SONG_KEYS = tuple("song" if field == "title" else field for field in SONG_FIELDS)
+IDX_FILE = SONG_FIELDS.index("file")
+IDX_ARTIST = SONG_FIELDS.index("artist")
+IDX_ALBUMARTIST = SONG_FIELDS.index("albumartist")
+IDX_ALBUM = SONG_FIELDS.index("album")
+IDX_TITLE = SONG_FIELDS.index("title")
+IDX_OTHER = len(SONG_FIELDS)
+OTHER_FIELD = "other"  # (Tag, value) pairs of the tags that aren't SONG_FIELDS, None when there are none
+RECORD_FIELDS = SONG_FIELDS + (OTHER_FIELD,)
+SEARCH_FIELDS = ("artist", "album", "title")  # Fields with a search index
+
+FILE_SNAPSHOT = "config/library_snapshot.arrow"
+
+
+def _tag_value(value):
+    """MPD returns a list for tags that occur more than once in a file, they are kept as tuples in the records"""
+    return tuple(value) if isinstance(value, list) else value
+
+
+def _tag_values(value) -> tuple:
+    """The values of a tag in a record, as a tuple also when the tag occurs once or not at all"""
+    if value is None:
+        return ()
+    return value if isinstance(value, tuple) else (value,)
+
+
+def _served_value(value):
+    return list(value) if isinstance(value, tuple) else value
+
+
+def song_record(entry: dict) -> tuple:
+    """The record of a song, as kept in the library index and it's snapshot
+
+    Args:
+        entry (dict): A song dictionary as returned by MPD, with it's values typed by helper.type_library_dict
+
+    Returns:
+        tuple: The values of the SONG_FIELDS, followed by the (tag, value) pairs of the other tags or None
+    """
+    tpl_other = tuple((key, _tag_value(value)) for key, value in entry.items() if key not in SONG_FIELDS)
+    return tuple(_tag_value(entry.get(field)) for field in SONG_FIELDS) + (tpl_other or None,)
+
+
+class _IndexContents:
+    """The songs and lookup maps of one build of the library index.
+
+    Contents are never changed once built. A rebuild creates new contents that replace the previous ones with a
+    single assignment, so a lookup that took the previous contents finishes on them consistently.
+    """
+
+    __slots__ = ("songs", "files", "artists", "album_artists", "search", "is_loaded")
+
+    def __init__(self, songs: list, files: dict, artists: dict, album_artists: dict, search: dict,
+                 is_loaded: bool = True) -> None:
+        self.songs = songs  # Records made by song_record()
+        self.files = files  # File -> position in songs
+        self.artists = artists  # Artist -> album -> positions in songs
+        self.album_artists = album_artists  # Album artist -> album -> positions in songs
+        self.search = search  # Field -> TagSearchIndex of the SEARCH_FIELDS
+        self.is_loaded = is_loaded
+
+    def song_dict(self, idx: int) -> dict:
+        """A song as a dictionary shaped like the typed and renamed MPD results, with all of it's tags"""
+        song = self.songs[idx]
+        dict_song = {
+            key: _served_value(value)
+            for key, value in zip(SONG_KEYS, song)
+            if value is not None
+        }
+        if song[IDX_OTHER] is not None:
+            dict_song.update((key, _served_value(value)) for key, value in song[IDX_OTHER])
+        return dict_song
+
+    def album(self, dict_albums: dict, name_album: str) -> dict:
+        lst_idx = dict_albums.get(name_album)
+        if lst_idx is None:
+            return None
+        return {"album": name_album, "files": [self.song_dict(idx) for idx in lst_idx]}
+
+
+class LibraryIndex:
+    """An in-memory copy of the MPD library, loaded with a single listallinfo and reloaded when the MPD database changes.
+
+    Songs are kept as records of their tags, with artist -> album -> song maps pointing to their positions.
+    The songs are persisted in a snapshot, so after a restart the index is only reloaded from MPD when MPD's
+    database was updated in the meantime.
+    """
+
+    def __init__(self, host: str, port: int = 6600) -> None:
+        self.host = host
+        self.port = port
+        self.pool = get_pool(host=host, port=port)
+        self.snapshot = LibrarySnapshot(file_path=FILE_SNAPSHOT, fields=RECORD_FIELDS, field_other=OTHER_FIELD)
+        self._db_update: int = None
+        self._contents = _IndexContents(songs=[], files={}, artists={}, album_artists={}, search={}, is_loaded=False)
+        self._is_started = False
+        self._lock: asyncio.Lock = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._contents.is_loaded
+
+    @property
+    def qty_songs(self) -> int:
+        return len(self._contents.songs)
+
+    def start(self) -> None:
+        """Starts loading the index in the background and keeps it in sync with the MPD database"""
+        if not self._is_started:
+            hub = get_event_hub(host=self.host, port=self.port)
+            hub.add_listener(["database"], self._on_database_changed)
+            hub.start()
+            self._is_started = True
+
+    async def _on_database_changed(self, subsystems: set) -> None:
+        # The event hub also reports all subsystems after (re)connecting, load() skips the reload if nothing changed
+        await self.load()
+
+    async def load(self) -> None:
+        """(Re)loads the index when MPD's database changed, from the snapshot if it is still valid or else from MPD"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            time_start = time.monotonic()
+            async with self.pool.lease() as mpd:
+                dict_stats = await mpd.stats()
+            db_update = int(dict_stats.get("db_update", 0))
+            if self.is_loaded and db_update == self._db_update:
+                logger.info("MPD database is unchanged, keeping the library index")
+                return
+
+            loop = asyncio.get_running_loop()
+            lst_records = await loop.run_in_executor(None, self.snapshot.read, db_update)
+            # Building runs in a thread, so requests are still served from the previous index meanwhile
+            if lst_records is not None:
+                await loop.run_in_executor(None, self.build_from_records, lst_records)
+                source = "snapshot"
+            else:
+                async with self.pool.lease() as mpd:
+                    lst_entries = await mpd.listallinfo()
+                lst_entries = [entry for entry in lst_entries if "file" in entry]
+                await loop.run_in_executor(None, self.build, lst_entries)
+                await loop.run_in_executor(None, self.snapshot.write, self._contents.songs, db_update)
+                source = "MPD"
+            self._db_update = db_update
+            logger.info(
+                f"Loaded {self.qty_songs} songs in the library index from {source} in {time.monotonic() - time_start:.2f} seconds"
+            )
+
+    def build(self, entries) -> None:
+        """Builds the index from MPD song dictionaries, replacing the current index when done
+
+        Args:
+            entries (iterable): Song dictionaries as returned by MPD
+        """
+        self.build_from_records(song_record(entry) for entry in map(helper.type_library_dict, entries))
+
+    def build_from_records(self, records) -> None:
+        """Builds the index from song records, replacing the current index when done
+
+        Args:
+            records (iterable): Song records made by song_record()
+        """
+        lst_songs = []
+        dict_files = {}
+        dict_artists = {}
+        dict_album_artists = {}
+        for song in records:
+            idx = len(lst_songs)
+            lst_songs.append(song)
+            dict_files[song[IDX_FILE]] = idx
+            # Songs are filed under each of the values of tags that occur more than once, like MPD's find matches them
+            tpl_albums = _tag_values(song[IDX_ALBUM]) or ("",)
+            for artist in _tag_values(song[IDX_ARTIST]):
+                for album in tpl_albums:
+                    dict_artists.setdefault(artist, {}).setdefault(album, []).append(idx)
+            for album_artist in _tag_values(song[IDX_ALBUMARTIST]) or ("",):
+                for album in tpl_albums:
+                    if album != "":
+                        dict_album_artists.setdefault(album_artist, {}).setdefault(album, []).append(idx)
+        dict_search = {
+            field: TagSearchIndex.build(song[SONG_FIELDS.index(field)] for song in lst_songs)
+            for field in SEARCH_FIELDS
+        }
+        self._contents = _IndexContents(
+            songs=lst_songs,
+            files=dict_files,
+            artists=dict_artists,
+            album_artists=dict_album_artists,
+            search=dict_search,
+        )
+
+    def get_song_file(self, file: str) -> dict:
+        contents = self._contents
+        idx = contents.files.get(file)
+        return None if idx is None else contents.song_dict(idx)
+
+    def get_artists(self) -> list:
+        return [{"artist": artist} for artist in sorted(self._contents.artists.keys())]
+
+    def get_albums(self) -> list:
+        dict_album_artists = self._contents.album_artists
+        lst_albums = []
+        for album_artist in sorted(dict_album_artists.keys()):
+            for album in sorted(dict_album_artists[album_artist].keys()):
+                lst_albums.append({"albumartist": album_artist, "album": album})
+        return lst_albums
+
+    def get_artist_albums(self, name_artist: str) -> list:
+        contents = self._contents
+        dict_albums = contents.artists.get(name_artist, {})
+        return [contents.album(dict_albums, album) for album in dict_albums]
+
+    def get_album(self, name_artist: str, name_album: str) -> dict:
+        contents = self._contents
+        return contents.album(contents.artists.get(name_artist, {}), name_album)
+
+    def get_album_artist_album(self, name_album_artist: str, name_album: str) -> dict:
+        contents = self._contents
+        return contents.album(contents.album_artists.get(name_album_artist, {}), name_album)
+
+    def find_songs(self, field: str, value: str, starts_with: bool = False, limit: int = None) -> list:
+        """Songs that contain a value in a tag, ignoring case like MPD's search
+
+        Args:
+            field (str): One of the SONG_FIELDS
+            value (str): The (partial) value that is searched for
+            starts_with (bool, optional): Only match tags starting with the value. Defaults to False.
+            limit (int, optional): The maximum number of songs returned. Defaults to no limit.
+
+        Returns:
+            list: Song dictionaries of the matching songs
+        """
+        contents = self._contents
+        if field in contents.search:
+            lst_idx = contents.search[field].search(text=value, starts_with=starts_with, limit=limit)
+            return [contents.song_dict(idx) for idx in lst_idx]
+        idx_field = SONG_FIELDS.index(field)
+        value = value.casefold()
+        lst_idx = [
+            idx
+            for idx, song in enumerate(contents.songs)
+            if any(
+                tag.casefold().startswith(value) if starts_with else value in tag.casefold()
+                for tag in _tag_values(song[idx_field])
+            )
+        ]
+        return [contents.song_dict(idx) for idx in lst_idx[:limit]]
+
+    def find_similar(self, field: str, value: str, limit: int = 10) -> list:
+        """Tag values ranked by their similarity to a (possibly misspelled) value
+
+        Args:
+            field (str): One of the SEARCH_FIELDS
+            value (str): The value to compare with
+            limit (int, optional): The maximum number of values returned. Defaults to 10.
+
+        Returns:
+            list: Dictionaries with the tag value ('name'), it's similarity 'score' and 'qty_songs'
+        """
+        return self._contents.search[field].similar(text=value, limit=limit)
+
+    def complete(self, field: str, text: str, limit: int = 10) -> list:
+        """Tag values starting with a text, the values with the most songs first
+
+        Args:
+            field (str): One of the SEARCH_FIELDS
+            text (str): The start of the tag value
+            limit (int, optional): The maximum number of values returned. Defaults to 10.
+
+        Returns:
+            list: Tag values
+        """
+        return self._contents.search[field].complete(text=text, limit=limit)
+
+
+@shared_per_server
+def get_library_index(host: str, port: int = 6600) -> LibraryIndex:
+    """The library index shared by all MPD clients of a server
+
+    Args:
+        host (str): MPD server host
+        port (int, optional): MPD server port. Defaults to 6600.
+
+    Returns:
+        LibraryIndex: The library index of the server
+    """
+    return LibraryIndex(host=host, port=port)
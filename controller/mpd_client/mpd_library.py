@@ -1,8 +1,17 @@
+import asyncio
 import logging
+import os
 import random as rnd
 
+from mpd.asyncio import ConnectionError
+
 from mpd_client import helper
+from mpd_client.cover_cache import get_cover_cache
+from mpd_client.cover_thumbnails import THUMBNAIL_FORMATS, get_thumbnail
+from mpd_client.mpd_binary import get_binary_reader
 from mpd_client.mpd_connector import MPDConnection
+from mpd_client.mpd_index import get_library_index
+from mpd_client.mpd_query import MPDQuery
 
 logging.basicConfig(
     format="%(levelname)s:\t%(asctime)s - %(module)s: %(message)s",
@@ -15,78 +24,211 @@ logger = logging.getLogger(__name__)
 class MPDLibrary(MPDConnection):
     def __init__(self, host, port=6600):
         super(MPDLibrary, self).__init__(host=host, port=port)
-
-    async def __get_cover_binary(self, uri: str) -> bytes:
+        self.index = get_library_index(host=host, port=port)
+        self.covers = get_cover_cache()
+        self.binary = get_binary_reader(host=host, port=port)
+        self._is_started = False
+
+    def start(self) -> None:
+        """Starts loading the library index, and keeps it and the cover cache in sync with the MPD database"""
+        if not self._is_started:
+            self.hub.add_listener(["database"], self.__on_database_changed)
+            self.index.start()
+            self._is_started = True
+
+    async def __on_database_changed(self, subsystems: set) -> None:
+        # Artwork may have been replaced, the event hub also reports all subsystems after (re)connecting
+        async with self.lease() as mpd:
+            dict_stats = await mpd.stats()
+        await self.covers.invalidate(db_update=int(dict_stats.get("db_update", 0)))
+
+    def __cover_sources(self, uri: str) -> list:
+        """The commands that retrieve a file's cover art, in order of preference, with their cover cache keys"""
+        # MPD looks up folder art per directory, so all files of an album share it
+        return [("albumart", os.path.dirname(uri)), ("readpicture", uri)]
+
+    async def __read_cover(self, command: str, uri: str) -> bytes:
         """Retrieving a file's coverart as a binary stream
 
         Args:
+            command (str): 'albumart' for the image in the file's directory, 'readpicture' for the embedded image
             uri (str): The file specifier from the MPD library
 
         Returns:
             bytes: A binary stream representing the file's cover image
         """
-        await self.connect()
-        try:
-            cover = await self.mpd.albumart(uri)
-            binary = cover["binary"]
-            logger.info(f"Retrieved album art for {uri}")
-        except:
-            logger.warning("Could not retrieve album cover of %s", uri)
-            binary = None
+        binary = await self.binary.read(command=command, uri=uri)
+        if binary:
+            logger.info(f"Retrieved {command} for {uri}")
         return binary
 
+    async def __read_streamed_cover(self, command: str, uri: str, queue: asyncio.Queue) -> bytes:
+        """Reads a cover chunk by chunk, passing each on to the queue as soon as it arrives
+
+        Runs as the cover cache's fetch of the cover, so it is read and cached completely even when the client stops
+        receiving it. The queue gets the MIME type first, None when there is no cover, followed by the chunks and
+        None at the end. When reading fails the queue ends with the exception instead.
+
+        Returns:
+            bytes: The complete image, or None when there is no cover
+        """
+        lst_chunks = []
+        try:
+            first_chunk = await self.binary.read_chunk(command=command, uri=uri)
+            if first_chunk is None:
+                queue.put_nowait(None)
+                return None
+            queue.put_nowait(first_chunk.get("type") or self.__determine_image_format(first_chunk["binary"]))
+            async for chunk in self.binary.stream(command=command, uri=uri, first_chunk=first_chunk):
+                lst_chunks.append(chunk)
+                queue.put_nowait(chunk)
+        except Exception as e:
+            # A stream that breaks off isn't cached
+            logger.error(f"Failed streaming {command} for {uri}: {e}")
+            queue.put_nowait(e)
+            raise
+        queue.put_nowait(None)
+        logger.info(f"Streamed {command} for {uri}")
+        return b"".join(lst_chunks)
+
+    async def __forward_cover(self, queue: asyncio.Queue):
+        while True:
+            chunk = await queue.get()
+            if chunk is None:
+                return
+            if isinstance(chunk, BaseException):
+                raise chunk
+            yield chunk
+
+    async def __iterate_cover(self, image: bytes):
+        yield image
+
     def __determine_image_format(self, image_data: bytes) -> str:
-        """Function to determine image format (PNG or JPG) based on magic bytes
+        """Function to determine image format based on magic bytes
 
         Args:
             image_data (bytes): A byte stream that represents an image
 
-        Raises:
-            ValueError: When encountering a different format than either PNG or JPG
-
         Returns:
-            str: A MIME type string
+            str: A MIME type string, application/octet-stream for formats that aren't recognised
         """
         if image_data.startswith(b"\x89PNG\r\n\x1a\n"):
             return "image/png"
         elif image_data.startswith(b"\xff\xd8"):
             return "image/jpeg"
+        elif image_data[:4] == b"RIFF" and image_data[8:12] == b"WEBP":
+            return "image/webp"
+        elif image_data.startswith((b"GIF87a", b"GIF89a")):
+            return "image/gif"
+        elif image_data.startswith(b"BM"):
+            return "image/bmp"
         else:
-            raise ValueError("Unsupported image format")
+            logger.warning("Serving cover art of an unrecognised image format")
+            return "application/octet-stream"
 
-    async def get_cover_art(self, uri: str) -> dict:
-        """Retrieve covert art of a file
+    async def get_cover_art(self, uri: str, size: int = None, image_format: str = "jpeg") -> dict:
+        """Retrieve covert art of a file, from the cover cache if it was retrieved before
 
         Args:
             uri (str): The file specifier from the MPD library
+            size (int, optional): Scale the art down to a thumbnail of this size in pixels. Defaults to the original.
+            image_format (str, optional): The format of the thumbnail, jpeg or webp. Defaults to jpeg.
 
         Returns:
-            dict: The MIME type of the art and the image in the form of a byte stream
+            dict: The MIME type of the art and the image in the form of a byte stream, None if there is no cover art
         """
-        await self.connect()
-        image_bytes: bytes = await self.__get_cover_binary(uri=uri)
+        for command, key in self.__cover_sources(uri):
+            image_bytes: bytes = await self.covers.get_or_fetch(
+                key=key, fetch=lambda: self.__read_cover(command=command, uri=uri)
+            )
+            if image_bytes is not None:
+                break
+        else:
+            logger.warning("Could not retrieve album cover of %s", uri)
+            return None
+        if size is not None:
+            thumbnail = await self.covers.get_or_fetch(
+                key=f"{key}#{size}.{image_format}",
+                fetch=lambda: get_thumbnail(image=image_bytes, size=size, image_format=image_format),
+            )
+            if thumbnail is not None:
+                return {"image_format": THUMBNAIL_FORMATS[image_format], "image": thumbnail}
         image_format = self.__determine_image_format(image_bytes)
         return {"image_format": image_format, "image": image_bytes}
 
-    async def get_album_cover(self, name_artist: str, name_album: str):
-        await self.connect()
-        album = await self.get_artist_albums(
-            name_artist=name_artist, name_album=name_album
-        )
-        if album is None:
+    async def stream_cover_art(self, uri: str) -> dict:
+        """Stream the cover art of a file while it is read from MPD, storing it in the cover cache on the way
+
+        Args:
+            uri (str): The file specifier from the MPD library
+
+        Returns:
+            dict: The MIME type of the art and an asynchronous iterator over it's chunks, None if there is no cover art
+        """
+        for command, key in self.__cover_sources(uri):
+            if self.covers.is_missing(key):
+                continue
+            image_bytes = await self.covers.get(key)
+            if image_bytes is None and self.covers.is_fetching(key):
+                # Another request is reading this cover from MPD, it's result is shared instead of reading it twice
+                image_bytes = await self.covers.wait_for_fetch(key)
+                if image_bytes is None:
+                    continue
+            if image_bytes is not None:
+                return {
+                    "image_format": self.__determine_image_format(image_bytes),
+                    "stream": self.__iterate_cover(image_bytes),
+                }
+            queue = asyncio.Queue()
+            self.covers.start_fetch(
+                key=key, fetch=lambda: self.__read_streamed_cover(command=command, uri=uri, queue=queue)
+            )
+            image_format = await queue.get()
+            if isinstance(image_format, Exception):
+                raise image_format
+            if image_format is None:
+                continue
+            return {"image_format": image_format, "stream": self.__forward_cover(queue)}
+        logger.warning("Could not retrieve album cover of %s", uri)
+        return None
+
+    async def __get_album_file(self, name_album_artist: str, name_album: str) -> str:
+        # Albums are looked up by album artist, so compilations under 'Various Artists' are found too
+        if self.index.is_loaded:
+            album = self.index.get_album_artist_album(name_album_artist=name_album_artist, name_album=name_album)
+            if album is None:
+                return None
+            return album["files"][0]["file"]
+        query = MPDQuery().equals("albumartist", name_album_artist).equals("album", name_album).window(0, 1)
+        async with self.lease() as mpd:
+            lst_query_results = await mpd.find(*query.arguments())
+        if len(lst_query_results) == 0:
+            return None
+        return lst_query_results[0]["file"]
+
+    async def get_album_cover(self, name_album_artist: str, name_album: str, size: int = None, image_format: str = "jpeg"):
+        file = await self.__get_album_file(name_album_artist=name_album_artist, name_album=name_album)
+        if file is None:
             return None
-        file = album["files"][0]["file"]
-        cover_art = await self.get_cover_art(uri=file)
+        cover_art = await self.get_cover_art(uri=file, size=size, image_format=image_format)
         return cover_art
 
+    async def stream_album_cover(self, name_album_artist: str, name_album: str) -> dict:
+        file = await self.__get_album_file(name_album_artist=name_album_artist, name_album=name_album)
+        if file is None:
+            return None
+        return await self.stream_cover_art(uri=file)
+
     async def get_artists(self):
         """All artists in the database
 
         :return: A list of dictionaries for artists
         """
-        await self.connect()
+        if self.index.is_loaded:
+            return self.index.get_artists()
         try:
-            lst_query_results = await self.mpd.list("artist")
+            async with self.lease() as mpd:
+                lst_query_results = await mpd.list("artist")
         except ConnectionError:
             lst_query_results = None
         return lst_query_results
@@ -101,9 +243,11 @@ class MPDLibrary(MPDConnection):
 
         :return: A list of dictionaries for albums with their artists
         """
-        await self.connect()
+        if self.index.is_loaded:
+            return self.index.get_albums()
         try:
-            lst_query_results = await self.mpd.list("album", "group", "albumartist")
+            async with self.lease() as mpd:
+                lst_query_results = await mpd.list("album", "group", "albumartist")
         except ConnectionError:
             return None
         transformed_list = []
@@ -128,8 +272,14 @@ class MPDLibrary(MPDConnection):
         return lst_results
 
     async def get_album(self, name_artist: str, name_album: str) -> list:
-        lst_artist_albums = await self.get_artist_albums(name_artist=name_artist)
-        lst_results = [album for album in lst_artist_albums if album['album'] == name_album]
+        if self.index.is_loaded:
+            return self.index.get_album(name_artist=name_artist, name_album=name_album)
+        query = MPDQuery().equals("artist", name_artist).equals("album", name_album)
+        async with self.lease() as mpd:
+            lst_query_results = await mpd.find(*query.arguments())
+        lst_query_results = helper.type_library(lst_query_results)
+        lst_query_results = helper.rename_song_dict_keys(lst_query_results)
+        lst_results = helper.nest_album(lst_query_results)
         if len(lst_results) > 0:
             return lst_results[0]
         else:
@@ -144,22 +294,34 @@ class MPDLibrary(MPDConnection):
         Returns:
             list: A list of dictionaries with albums and nested files for each album
         """
-        await self.connect()
+        if self.index.is_loaded:
+            return self.index.get_artist_albums(name_artist=name_artist)
         lst_query_results = []
-        lst_query_results = await self.mpd.find("artist", name_artist)
+        async with self.lease() as mpd:
+            lst_query_results = await mpd.find("artist", name_artist)
         lst_query_results = helper.type_library(lst_query_results)
         lst_query_results = helper.rename_song_dict_keys(lst_query_results)
         lst_query_results = helper.nest_album(lst_query_results)
         return lst_query_results
 
     async def get_song(self, name_song: str, name_artist: str=None, is_cover: bool=False):
-        await self.connect()
         lst_songs = []
-        lst_songs = await self.mpd.search("title", name_song)
-        # Improve dict interpretability
-        lst_songs = helper.rename_song_dict_keys(lst_songs)
-        lst_songs = helper.type_library(lst_songs)
+        if self.index.is_loaded:
+            lst_songs = self.index.find_songs(field="title", value=name_song)
+        else:
+            query = MPDQuery().contains("title", name_song)
+            if name_artist is not None:
+                if is_cover:
+                    query.not_equals("artist", name_artist)
+                else:
+                    query.equals("artist", name_artist)
+            async with self.lease() as mpd:
+                lst_songs = await mpd.search(*query.arguments())
+            # Improve dict interpretability
+            lst_songs = helper.rename_song_dict_keys(lst_songs)
+            lst_songs = helper.type_library(lst_songs)
         if name_artist is not None:
+            # Also applied after MPD's search, as it compares the artist ignoring case
             if is_cover:
                 lst_songs = [song for song in lst_songs if song['artist'] != name_artist]
             else:
@@ -170,11 +332,13 @@ class MPDLibrary(MPDConnection):
         return lst_songs
 
 
-    async def search(self, type: str, filter: str, starts_with: bool = False):
+    async def search(self, type: str, filter: str, starts_with: bool = False, limit: int = None):
         """Searches for artists, albums or songs.
 
         :param type: The type of music asset that is being searched for (artist, album or song)
         :param filter: The string that should be searched against, the searches are done with partial matching
+        :param starts_with: Only match assets that start with the filter string
+        :param limit: The maximum number of songs the results are made up of
         :return: A list of dictionaries, with a hierarchy depending on the type of search.
         """
         if len(filter) < 3:
@@ -186,21 +350,35 @@ class MPDLibrary(MPDConnection):
         if type == "song":  # To match MPD internal naming convention
             type = "title"
 
-        await self.connect()
-        list_query_results = await self.mpd.search(type, filter)
+        if self.index.is_loaded:
+            list_query_results = self.index.find_songs(
+                field=type, value=filter, starts_with=starts_with, limit=limit
+            )
+        else:
+            query = MPDQuery().contains(type, filter)
+            if limit is not None and not starts_with:
+                query.window(0, limit)
+            async with self.lease() as mpd:
+                list_query_results = await mpd.search(*query.arguments())
+            # starts_with is only understood by MPD 0.24 and up, so those matches are still selected here
+            if starts_with:
+                list_query_results = [
+                    item
+                    for item in list_query_results
+                    if item[type][: (len(filter))].upper() == filter.upper()
+                ]
+            list_query_results = list_query_results[:limit]
+            # Improve dict interpretability
+            list_query_results = helper.rename_song_dict_keys(list_query_results)
+            list_query_results = helper.type_library(list_query_results)
         if len(list_query_results) == 0:
-            return {"error": type + " " + filter + " not found."}
-
-        if starts_with:
-            list_query_results = [
-                item
-                for item in list_query_results
-                if item[type][: (len(filter))].upper() == filter.upper()
-            ]
-
-        # Improve dict interpretability
-        list_query_results = helper.rename_song_dict_keys(list_query_results)
-        list_query_results = helper.type_library(list_query_results)
+            result = {"error": type + " " + filter + " not found."}
+            if self.index.is_loaded:
+                result["suggestions"] = [
+                    item["name"]
+                    for item in self.index.find_similar(field=type, value=filter, limit=5)
+                ]
+            return result
 
         # Nest files if artists or albums are searched
         if type == "artist":
@@ -211,3 +389,42 @@ class MPDLibrary(MPDConnection):
             list_query_results = list_query_results
 
         return list_query_results
+
+    async def search_fuzzy(self, type: str, filter: str, limit: int = 10):
+        """Ranks artists, albums or songs by their similarity to a (possibly misspelled) search string
+
+        :param type: The type of music asset that is being searched for (artist, album or song)
+        :param filter: The string the assets are compared with
+        :param limit: The maximum number of assets returned
+        :return: A list of dictionaries with the asset name, it's similarity score (0 to 1) and number of songs
+        """
+        if type not in ["artist", "album", "song"]:
+            return [{"error": "incorrect search type"}]
+        if not self.index.is_loaded:
+            return {"error": "The library is still being loaded, try again later."}
+        field = "title" if type == "song" else type
+
+        lst_results = self.index.find_similar(field=field, value=filter, limit=limit)
+        return [
+            {type: item["name"], "score": item["score"], "qty_songs": item["qty_songs"]}
+            for item in lst_results
+        ]
+
+    async def autocomplete(self, text: str, type: str = None, limit: int = 10) -> dict:
+        """Completions of artist, album and song names starting with a text
+
+        :param text: The start of the name, at least one character
+        :param type: Only complete this type of music asset (artist, album or song), by default all types
+        :param limit: The maximum number of completions per type
+        :return: A dictionary with a list of completions for each type
+        """
+        if len(text) < 1:
+            return {"error": "Provide at least 1 character to complete"}
+        if not self.index.is_loaded:
+            return {"error": "The library is still being loaded, try again later."}
+        lst_types = ["artist", "album", "song"] if type is None else [type]
+        dict_results = {}
+        for type_asset in lst_types:
+            field = "title" if type_asset == "song" else type_asset
+            dict_results[type_asset] = self.index.complete(field=field, text=text, limit=limit)
+        return dict_results
@@ -0,0 +1,244 @@
+import asyncio
+from contextlib import asynccontextmanager
+import logging
+import os
+import time
+
+from dotenv import dotenv_values
+from mpd.asyncio import MPDClient, CommandError, ConnectionError
+
+from utils.shared_per_server import shared_per_server
+
+config = {
+    **dotenv_values(".env"),  # load shared development variables
+    **os.environ,  # override loaded values with environment variables
+}
+
+logging.basicConfig(
+    format="%(levelname)s:\t%(asctime)s - %(module)s: %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+    level=logging.INFO,
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = int(config.get("MPD_POOL_SIZE", 4))
+HEALTH_CHECK_AFTER = 30  # Seconds a connection can be idle before it is pinged on lease
+
+
+class ConnectionPool:
+    """Leases out up to size connections to a server, reusing the connections that are handed back.
+
+    Subclasses open, check and close the connections, which can be of any kind.
+    """
+
+    def __init__(self, host: str, port: int, size: int) -> None:
+        self.host = host
+        self.port = port
+        self.size = size
+        self._idle: list = []  # (connection, time returned) tuples, last returned is leased first
+        self._qty_open = 0
+        self._semaphore: asyncio.Semaphore = None
+        self._qty_leases = 0
+        self._wait_last = 0.0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    @property
+    def is_connected(self) -> bool:
+        return self._qty_open > 0
+
+    @property
+    def statistics(self) -> dict:
+        """Pool usage and the time spent waiting for a connection lease
+
+        Returns:
+            dict: Pool size, connections in use and lease wait times in milliseconds
+        """
+        qty_in_use = self._qty_open - len(self._idle)
+        wait_avg = self._wait_total / self._qty_leases if self._qty_leases > 0 else 0.0
+        return {
+            "size": self.size,
+            "connections_open": self._qty_open,
+            "connections_in_use": qty_in_use,
+            "leases": self._qty_leases,
+            "wait_ms_last": round(self._wait_last * 1000, 3),
+            "wait_ms_avg": round(wait_avg * 1000, 3),
+            "wait_ms_max": round(self._wait_max * 1000, 3),
+        }
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Created on first use so it is bound to the event loop that is actually running
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.size)
+        return self._semaphore
+
+    def _record_wait(self, seconds: float) -> None:
+        self._qty_leases += 1
+        self._wait_last = seconds
+        self._wait_total += seconds
+        self._wait_max = max(self._wait_max, seconds)
+
+    async def _open(self):
+        """Opens a new connection, raising ConnectionError when the server can't be reached"""
+        raise NotImplementedError
+
+    def _close(self, connection) -> None:
+        raise NotImplementedError
+
+    def _is_open(self, connection) -> bool:
+        raise NotImplementedError
+
+    async def _is_healthy(self, connection, time_returned: float) -> bool:
+        """Checks an idle connection before it is leased again"""
+        return self._is_open(connection)
+
+    def _discard(self, connection) -> None:
+        self._qty_open -= 1
+        self._close(connection)
+
+    async def _checkout(self):
+        while len(self._idle) > 0:
+            connection, time_returned = self._idle.pop()
+            if await self._is_healthy(connection, time_returned):
+                return connection
+            self._discard(connection)
+        connection = await self._open()
+        self._qty_open += 1
+        return connection
+
+    async def acquire(self):
+        """Leases a connection, waiting for one to be returned when all are in use
+
+        Raises:
+            ConnectionError: When no connection to the server could be made
+
+        Returns:
+            A connection that must be handed back with release or discard
+        """
+        time_start = time.monotonic()
+        semaphore = self._get_semaphore()
+        await semaphore.acquire()
+        self._record_wait(time.monotonic() - time_start)
+        try:
+            connection = await self._checkout()
+        except BaseException:
+            semaphore.release()
+            raise
+        return connection
+
+    def release(self, connection) -> None:
+        """Returns a leased connection to the pool
+
+        Args:
+            connection: The connection that was leased with acquire
+        """
+        if self._is_open(connection):
+            self._idle.append((connection, time.monotonic()))
+        else:
+            self._discard(connection)
+        self._get_semaphore().release()
+
+    def discard(self, connection) -> None:
+        """Closes a leased connection instead of returning it to the pool
+
+        For connections that may still have commands or responses underway, which would otherwise end up
+        in the responses of the next lease.
+
+        Args:
+            connection: The connection that was leased with acquire
+        """
+        self._discard(connection)
+        self._get_semaphore().release()
+
+    @asynccontextmanager
+    async def lease(self):
+        """Leases a connection for the duration of a with block
+
+        The connection is returned to the pool when the block ends normally or with a CommandError, for which the
+        response was read up to it's end. Any other error closes it.
+
+        Example:
+            async with pool.lease() as mpd:
+                status = await mpd.status()
+        """
+        connection = await self.acquire()
+        try:
+            yield connection
+        except CommandError:
+            self.release(connection)
+            raise
+        except BaseException:
+            self.discard(connection)
+            raise
+        else:
+            self.release(connection)
+
+    def close(self) -> None:
+        """Closes all idle connections"""
+        while len(self._idle) > 0:
+            connection, _ = self._idle.pop()
+            self._discard(connection)
+
+
+class MPDConnectionPool(ConnectionPool):
+    """A pool of MPD connections which are leased out for the duration of a command sequence.
+
+    Every lease gets a connection of its own, so a long running response (like `listall`)
+    doesn't hold up a control command (like `pause`) that is issued at the same time.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int = 6600,
+        size: int = DEFAULT_POOL_SIZE,
+        health_check_after: float = HEALTH_CHECK_AFTER,
+    ) -> None:
+        super().__init__(host=host, port=port, size=size)
+        self.health_check_after = health_check_after
+
+    async def _open(self) -> MPDClient:
+        client = MPDClient()
+        logger.info(f"Connecting to MPD server on {self.host}:{self.port}")
+        try:
+            await client.connect(self.host, self.port)
+        except (ConnectionError, OSError):
+            logger.error(f"Failed to connect to MPD server on {self.host}:{self.port}")
+            raise ConnectionError(
+                f"Failed to connect to MPD server on {self.host}:{self.port}"
+            )
+        return client
+
+    def _close(self, client: MPDClient) -> None:
+        if client.connected:
+            client.disconnect()
+
+    def _is_open(self, client: MPDClient) -> bool:
+        return client.connected
+
+    async def _is_healthy(self, client: MPDClient, time_returned: float) -> bool:
+        """Checks a pooled connection, only pinging it when it has been idle for a while"""
+        if not client.connected:
+            return False
+        if time.monotonic() - time_returned < self.health_check_after:
+            return True
+        try:
+            await client.ping()
+        except (ConnectionError, OSError):
+            logger.warning(f"Dropping stale connection to MPD server on {self.host}:{self.port}")
+            return False
+        return True
+
+
+@shared_per_server
+def get_pool(host: str, port: int = 6600) -> MPDConnectionPool:
+    """The connection pool shared by all MPD clients of a server
+
+    Args:
+        host (str): MPD server host
+        port (int, optional): MPD server port. Defaults to 6600.
+
+    Returns:
+        MPDConnectionPool: The pool for the server
+    """
+    return MPDConnectionPool(host=host, port=port)
@@ -0,0 +1,67 @@
+def escape_value(value: str) -> str:
+    """Quotes a value for use in an MPD filter expression
+
+    Args:
+        value (str): The value as it should be matched
+
+    Returns:
+        str: The value between single quotes, with quotes and backslashes escaped
+    """
+    return "'" + str(value).replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+
+class MPDQuery:
+    """Compiles a library lookup into the arguments of MPD's find and search commands, so MPD only returns
+    the songs that are needed instead of them being filtered afterwards
+
+    Example:
+        query = MPDQuery().contains("title", "Purple Rain").not_equals("artist", "Prince").window(0, 10)
+        lst_songs = await mpd.search(*query.arguments())
+    """
+    def __init__(self) -> None:
+        self._lst_conditions = []
+        self._window = None
+
+    def __condition(self, tag: str, operator: str, value: str):
+        self._lst_conditions.append(f"({tag} {operator} {escape_value(value)})")
+        return self
+
+    def equals(self, tag: str, value: str):
+        """Songs of which the tag has exactly the value (ignoring case with search)"""
+        return self.__condition(tag, "==", value)
+
+    def not_equals(self, tag: str, value: str):
+        """Songs of which the tag doesn't have the value"""
+        return self.__condition(tag, "!=", value)
+
+    def contains(self, tag: str, value: str):
+        """Songs of which the tag contains the value"""
+        return self.__condition(tag, "contains", value)
+
+    def window(self, start: int, end: int = None):
+        """Only returns the songs from position start up to, but not including, end"""
+        self._window = f"{start}:{end}" if end is not None else f"{start}:"
+        return self
+
+    @property
+    def expression(self) -> str:
+        """The filter expression of all conditions, like ((title == 'x') AND (artist != 'y'))"""
+        if len(self._lst_conditions) == 1:
+            return self._lst_conditions[0]
+        return "(" + " AND ".join(self._lst_conditions) + ")"
+
+    def arguments(self) -> list:
+        """The arguments for MPD's find, search, findadd or searchadd command
+
+        Raises:
+            ValueError: When no condition was added, MPD doesn't accept an empty filter
+
+        Returns:
+            list: The filter expression, followed by the window arguments if set
+        """
+        if len(self._lst_conditions) == 0:
+            raise ValueError("A query needs at least one condition")
+        lst_arguments = [self.expression]
+        if self._window is not None:
+            lst_arguments.extend(["window", self._window])
+        return lst_arguments
@@ -1,7 +1,11 @@
+import asyncio
 import logging
 
+from mpd.asyncio import CommandError, ConnectionError
+
 from mpd_client import helper
 from mpd_client.mpd_connector import MPDConnection
+from mpd_client.mpd_query import MPDQuery
 
 logging.basicConfig(
     format='%(levelname)s:\t%(asctime)s - %(module)s: %(message)s', datefmt='%Y-%m-%d %H:%M:%S',
@@ -9,30 +13,137 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+QTY_WINDOW_ATTEMPTS = 3  # Times a queue window is read again when the queue was changed while reading it
+QTY_COMMANDS_PER_BATCH = 100  # Commands sent before awaiting their responses, python-mpd2 queues at most 128
+
 class MPDQueue(MPDConnection):
     def __init__(self, host, port=6600):
         super(MPDQueue, self).__init__(host=host, port=port)
 
-    async def get_queue(self) -> list:
-        """ Current playlist
+    async def get_queue(self, start: int=None, end: int=None) -> list:
+        """ Current playlist, retrieved with a single playlistinfo command
+
+        Args:
+            start (int, optional): Position of the first song to retrieve. Defaults to the start of the queue.
+            end (int, optional): Position of the last song to retrieve (inclusive). Defaults to the end of the queue.
 
         :return: List of dictionaries, with the song information and the information about it's position in the playlist
         """
-        await self.connect()
-        lst_songs = []
-        playlist_pos = 0
-        playlist = await self.mpd.playlist()
-
-        # Getting complete songs information
-        for item in playlist:
-            song = await self.mpd.find('file', item.replace('file: ', ''))
-            song[0]['playlist_pos'] = playlist_pos
-            lst_songs = lst_songs + song
-            playlist_pos = playlist_pos + 1
+        async with self.lease() as mpd:
+            if start is None and end is None:
+                lst_songs = await mpd.playlistinfo()
+            elif end is None:
+                lst_songs = await mpd.playlistinfo((start,))
+            else:
+                lst_songs = await mpd.playlistinfo((start or 0, end + 1))
+
+        return self.__type_queue_songs(lst_songs)
+
+    async def get_queue_window(self, start: int=0, end: int=None) -> dict:
+        """ A consistent slice of the queue with the playlist version it belongs to and the queue length
+
+        The status is requested right before and after the slice on the same connection. When another client
+        changed the queue in between, the versions differ and the slice is read again.
+
+        Args:
+            start (int, optional): Position of the first song to retrieve. Defaults to 0.
+            end (int, optional): Position of the last song to retrieve (inclusive). Defaults to the end of the queue.
+
+        Returns:
+            dict: The playlist 'version', the queue length as 'total' and the songs of the slice as 'songs'
+        """
+        window = (start,) if end is None else (start, end + 1)
+        for _ in range(QTY_WINDOW_ATTEMPTS):
+            async with self.lease() as mpd:
+                status_before = mpd.status()
+                songs = mpd.playlistinfo(window)
+                status_after = mpd.status()
+                status_before = await status_before
+                try:
+                    lst_songs = await songs
+                except CommandError:
+                    # The window starts beyond the end of the queue
+                    lst_songs = []
+                status_after = await status_after
+            if status_before['playlist'] == status_after['playlist']:
+                break
+            logger.info("Queue changed while reading a window of it, reading it again")
+        return {
+            'version': int(status_after['playlist']),
+            'total': int(status_after['playlistlength']),
+            'songs': self.__type_queue_songs(lst_songs)
+        }
+
+    async def search(self, filters: dict, exact: bool=False) -> list:
+        """ Songs in the queue matching tag values, searched by MPD itself
+
+        Args:
+            filters (dict): Tag names ('artist', 'album', 'song', 'file', 'any', ...) with the values they should match
+            exact (bool, optional): Match the complete, case sensitive value instead of a part of it ignoring case. Defaults to False.
+
+        Returns:
+            list: The matching songs with their information and their position and id in the queue
+        """
+        lst_arguments = []
+        for tag, value in filters.items():
+            lst_arguments.extend(['title' if tag == 'song' else tag, value])
+        async with self.lease() as mpd:
+            if exact:
+                lst_songs = await mpd.playlistfind(*lst_arguments)
+            else:
+                lst_songs = await mpd.playlistsearch(*lst_arguments)
+        return self.__type_queue_songs(lst_songs)
+
+    def __type_queue_songs(self, lst_songs: list) -> list:
+        for song in lst_songs:
+            song['playlist_pos'] = int(song.pop('pos'))
+            song['id'] = int(song['id'])
         lst_songs = helper.rename_song_dict_keys(lst_songs)
         lst_songs = helper.type_library(lst_songs)
         return lst_songs
 
+    async def get_changes(self, version: int, with_info: bool=False) -> dict:
+        """ Changes to the queue since a playlist version, so clients can keep their copy of the queue in sync
+
+        Inserted and moved songs are reported at their new position. Removed songs aren't reported, the queue
+        'length' tells clients where to truncate their copy. When the client's version is newer than MPD's (MPD was
+        restarted) all songs are reported and 'reset' is set.
+
+        Args:
+            version (int): The playlist version of the client's copy of the queue
+            with_info (bool, optional): Report the songs with all their information instead of their position and id. Defaults to False.
+
+        Returns:
+            dict: The current playlist 'version', the queue 'length', 'reset' and the changed songs as 'changes'
+        """
+        async with self.lease() as mpd:
+            # Status is sent first, so changes made in between are reported rather than missed
+            status = mpd.status()
+            changes = mpd.plchanges(version) if with_info else mpd.plchangesposid(version)
+            status = await status
+            lst_changes = await changes
+            version_current = int(status['playlist'])
+            is_reset = version > version_current
+            if is_reset:
+                lst_changes = await (mpd.plchanges(0) if with_info else mpd.plchangesposid(0))
+        if with_info:
+            lst_changes = self.__type_queue_songs(lst_changes)
+        else:
+            lst_changes = [
+                {'playlist_pos': int(change['cpos']), 'id': int(change['id'])} for change in lst_changes
+            ]
+        return {
+            'version': version_current,
+            'length': int(status['playlistlength']),
+            'reset': is_reset,
+            'changes': lst_changes
+        }
+
+    async def __queue_or_changes(self, version: int=None):
+        if version is None:
+            return await self.get_queue()
+        return await self.get_changes(version=version)
+
     async def play(self, position: int) -> bool:
         """Begins playing the queue at song at _position
 
@@ -42,12 +153,13 @@ class MPDQueue(MPDConnection):
         Returns:
             bool: Success of play selection
         """
-        await self.connect()
-        status = await self.get_status()
+        status = await self.hub.get_status()
         if status is not None:
             qty_songs_playlist = status['playlistlength']
             if qty_songs_playlist > position:
-                await self.mpd.play(position)
+                async with self.lease() as mpd:
+                    await mpd.play(position)
+                self.invalidate(['player'])
                 logger.info(f"Selected a song at position {position} to start playing.")
                 return True
             else:
@@ -61,43 +173,117 @@ class MPDQueue(MPDConnection):
 
         :return: A dictionary, with the song information and the information about it's position in the playlist
         """
-        await self.connect()
-        playing = await self.mpd.currentsong()
+        async with self.lease() as mpd:
+            playing = await mpd.currentsong()
         playing = helper.rename_song_dict_keys(playing)
         return playing
 
-    async def add(self, type_asset: str, name: str, play: bool=False, replace=False):
-        """ Adds a music asset to the current queue
+    async def now_playing(self) -> dict:
+        """ Everything a player screen shows: the status, the current song and the song that plays next
 
-        :param type: The name of the album
-        :param filter: The string that should be searched against, the searches are done with partial matching
-        :param unknown: I want to play this now by: replacing the playlist, adding it right after
+        The status comes from the event hub's cache, so the songs are retrieved in a single round trip to MPD.
+
+        Returns:
+            dict: The 'status', 'current_song' and 'next_song', the songs are empty when there are none
         """
-        await self.connect()
-        lst_songs = []
-        if(type_asset not in ['artist', 'album', 'file']):
-            return [{'error': 'incorrect search type'}]
+        status = await self.hub.get_status()
+        async with self.lease() as mpd:
+            current_song = mpd.currentsong()
+            next_song = mpd.playlistid(status['nextsongid']) if 'nextsongid' in status else None
+            current_song = await current_song
+            try:
+                lst_next_song = await next_song if next_song is not None else []
+            except CommandError:
+                # The next song was removed after the status was cached
+                lst_next_song = []
+        if current_song:
+            current_song = self.__type_queue_songs([current_song])[0]
+        lst_next_song = self.__type_queue_songs(lst_next_song)
+        return {
+            'status': status,
+            'current_song': current_song,
+            'next_song': lst_next_song[0] if len(lst_next_song) > 0 else {},
+        }
 
-        lst_songs = await self.mpd.find(type_asset, name)
-        if(lst_songs is None or len(lst_songs) == 0):
-            return({'error': type_asset + ' \'' + name + '\' not found.'})
+    async def add(self, type_asset: str, name: str, play: bool=False, replace: bool=False, position: int=None) -> dict:
+        """ Adds all songs of an artist, an album or a single file to the queue with a single findadd
 
-        # Add songs to the current queue
-        for song in lst_songs:
-            await self.mpd.findadd('file', song['file'])
+        Args:
+            type_asset (str): The kind of asset, 'artist', 'album' or 'file'
+            name (str): The exact name of the asset
+            play (bool, optional): Start playing the first added song. Defaults to False.
+            replace (bool, optional): Replace the songs in the queue, when any were found. Defaults to False.
+            position (int, optional): The position in the queue the songs are added at. Defaults to the end of the queue.
 
-        return lst_songs
+        Returns:
+            dict: The number of songs added ('qty_added') and the position of the first ('playlist_pos'), or an 'error'
+        """
+        if type_asset not in ['artist', 'album', 'file']:
+            return {'error': 'incorrect search type'}
+
+        if replace:
+            # Added behind the current songs, which are only removed once something was added
+            position = None
+
+        # The queue length is read on the same connection right before and after the songs are added, the commands
+        # are sent back to back before awaiting any of the responses
+        async with self.lease() as mpd:
+            status_before = mpd.status()
+            lst_arguments = MPDQuery().equals(type_asset, name).arguments()
+            if position is not None:
+                lst_arguments.extend(['position', position])
+            result = mpd.findadd(*lst_arguments)
+            status_after = mpd.status()
+            qty_before = int((await status_before)['playlistlength'])
+            result, = await asyncio.gather(result, return_exceptions=True)
+            if isinstance(result, Exception) and not isinstance(result, CommandError):
+                raise result
+            qty_added = int((await status_after)['playlistlength']) - qty_before
+            position_added = qty_before if position is None else position
+            # Replacing and playing depend on whether songs were added, so they can't be sent along with findadd
+            lst_commands = []
+            if replace and qty_added > 0 and qty_before > 0:
+                lst_commands.append(mpd.delete((0, qty_before)))
+                position_added = 0
+            if play and qty_added > 0:
+                lst_commands.append(mpd.play(position_added))
+            await asyncio.gather(*lst_commands)
+        self.invalidate(['playlist', 'player'])
 
-    async def delete_items(self, start:int, end: int):
-        await self.connect()
-        await self.mpd.delete((start, end+1))
-        playlist = await self.get_queue()
+        if isinstance(result, CommandError):
+            logger.error(f"Failed adding {type_asset} '{name}' to the queue: {result}")
+            return {'error': str(result)}
+        if qty_added <= 0:
+            return {'error': type_asset + ' \'' + name + '\' not found.'}
+        return {'qty_added': qty_added, 'playlist_pos': position_added}
+
+    async def delete_items(self, start:int, end: int, version: int=None):
+        """ Removes songs from the queue
+
+        Args:
+            start (int): Position of the first song to remove
+            end (int): Position of the last song to remove (inclusive)
+            version (int, optional): Return the changes since this playlist version instead of the whole queue. Defaults to None.
+        """
+        async with self.lease() as mpd:
+            await mpd.delete((start, end+1))
+        self.invalidate(['playlist'])
+        playlist = await self.__queue_or_changes(version=version)
         return playlist
 
-    async def move_items(self, start: int, end: int, to: int):
-        await self.connect()
-        await self.mpd.move((start, end+1), to)
-        playlist = await self.get_queue()
+    async def move_items(self, start: int, end: int, to: int, version: int=None):
+        """ Moves songs within the queue
+
+        Args:
+            start (int): Position of the first song to move
+            end (int): Position of the last song to move (inclusive)
+            to (int): The position the songs are moved to
+            version (int, optional): Return the changes since this playlist version instead of the whole queue. Defaults to None.
+        """
+        async with self.lease() as mpd:
+            await mpd.move((start, end+1), to)
+        self.invalidate(['playlist'])
+        playlist = await self.__queue_or_changes(version=version)
         return playlist
 
     async def add_file(self, file: str, position: int, start_playing: bool, clear: bool=False):
@@ -110,19 +296,79 @@ class MPDQueue(MPDConnection):
             clear (bool, optional): Clear the playlist before adding the file. Defaults to False.
 
         Returns:
-            _type_: _description_
+            list: The queue after adding the file
+        """
+        playlist = await self.add_files(files=[file], position=position, start_playing=start_playing, clear=clear)
+        return playlist
+
+    async def add_files(self, files: list, position: int, start_playing: bool, clear: bool=False, version: int=None):
+        """Adds files to the queue in batches, fetching the resulting queue once
+
+        The commands of a batch are sent back to back over a single connection before any of their responses are
+        awaited, so adding costs one round trip per QTY_COMMANDS_PER_BATCH files instead of one per file.
+
+        Args:
+            files (list): The files to be added
+            position (int): The position at which the first file is added to the playlist
+            start_playing (bool): Start playing the first added file immediately
+            clear (bool, optional): Clear the playlist before adding the files. Defaults to False.
+            version (int, optional): Return the changes since this playlist version instead of the whole queue. Defaults to None.
+
+        Raises:
+            CommandError: When MPD couldn't add one of the files, the queue is then left unchanged
+
+        Returns:
+            list: The queue after adding the files
         """
-        await self.connect()
-        if clear:
-            position = 0
-            await self.mpd.clear()
-        await self.mpd.addid(file, position)
-        if start_playing:
-            await self.mpd.play(position)
-        playlist = await self.get_queue()
+        lst_ids = []
+        is_added = False
+        try:
+            async with self.lease() as mpd:
+                if clear:
+                    # Added behind the current songs, which are only removed once all files were added
+                    qty_before = int((await mpd.status())['playlistlength'])
+                    position = 0
+                for start in range(0, len(files), QTY_COMMANDS_PER_BATCH):
+                    lst_batch = files[start:start + QTY_COMMANDS_PER_BATCH]
+                    if clear:
+                        lst_commands = [mpd.addid(file) for file in lst_batch]
+                    else:
+                        lst_commands = [mpd.addid(file, position + start + offset) for offset, file in enumerate(lst_batch)]
+                    lst_results = await asyncio.gather(*lst_commands, return_exceptions=True)
+                    lst_ids.extend(result for result in lst_results if not isinstance(result, BaseException))
+                    lst_errors = [result for result in lst_results if isinstance(result, BaseException)]
+                    if len(lst_errors) > 0:
+                        # Other errors than MPD refusing a file are raised first, so the lease discards the connection
+                        raise next((error for error in lst_errors if not isinstance(error, CommandError)), lst_errors[0])
+                is_added = True
+                lst_commands = []
+                if clear and qty_before > 0:
+                    lst_commands.append(mpd.delete((0, qty_before)))
+                if start_playing and len(files) > 0:
+                    lst_commands.append(mpd.play(position))
+                await asyncio.gather(*lst_commands)
+        except Exception as e:
+            logger.error(f"Failed adding files to the queue: {e}")
+            if not is_added and len(lst_ids) > 0:
+                await self.__delete_ids(lst_ids)
+            raise
+        finally:
+            self.invalidate(['playlist', 'player'])
+        playlist = await self.__queue_or_changes(version=version)
         return playlist
 
+    async def __delete_ids(self, lst_ids: list) -> None:
+        """Removes the songs a failed batch did add, on a connection of it's own as the batch's may be broken"""
+        try:
+            async with self.lease() as mpd:
+                for start in range(0, len(lst_ids), QTY_COMMANDS_PER_BATCH):
+                    lst_batch = lst_ids[start:start + QTY_COMMANDS_PER_BATCH]
+                    await asyncio.gather(*[mpd.deleteid(id_song) for id_song in lst_batch], return_exceptions=True)
+        except (ConnectionError, OSError) as e:
+            logger.error(f"Failed removing the {len(lst_ids)} songs that were added: {e}")
+
     async def clear(self):
         """Clears the current playlist"""
-        await self.connect()
-        self.mpd.clear()
\ No newline at end of file
+        async with self.lease() as mpd:
+            await mpd.clear()
+        self.invalidate(['playlist', 'player'])
\ No newline at end of file
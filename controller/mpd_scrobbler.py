@@ -205,26 +205,28 @@ class Scrobbler:
         await self.__post_to_lastfm(dict_indicators=dict_indicators)
 
         while is_connected:
-            async for result in self.mpd.mpd.idle(["player"]):
-                status = await self.mpd.get_status()
-                control_state = status["state"]
-
-                dict_indicators = await self.__gather_play_status(
-                    prev_playing_track=prev_playing_track
-                )
-                await self.__post_to_lastfm(dict_indicators=dict_indicators)
-
-                # Stopwatch
-                if control_state == "play":
-                    if prev_control_state == "pause":
-                        self.stopwatch.resume()
-                    elif prev_control_state == "play" or prev_control_state == "stop":
-                        self.stopwatch.start()
-                elif control_state == "pause":
-                    self.stopwatch.pause()
-
-                prev_playing_track = await self.get_playing()
-                prev_control_state = control_state
+            # The idling connection stays leased, the other commands use the rest of the pool
+            async with self.mpd.lease() as mpd:
+                async for result in mpd.idle(["player"]):
+                    status = await self.mpd.get_status()
+                    control_state = status["state"]
+
+                    dict_indicators = await self.__gather_play_status(
+                        prev_playing_track=prev_playing_track
+                    )
+                    await self.__post_to_lastfm(dict_indicators=dict_indicators)
+
+                    # Stopwatch
+                    if control_state == "play":
+                        if prev_control_state == "pause":
+                            self.stopwatch.resume()
+                        elif prev_control_state == "play" or prev_control_state == "stop":
+                            self.stopwatch.start()
+                    elif control_state == "pause":
+                        self.stopwatch.pause()
+
+                    prev_playing_track = await self.get_playing()
+                    prev_control_state = control_state
 
     async def start(self):
         is_first_pass = True
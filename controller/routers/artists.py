@@ -0,0 +1,91 @@
+from fastapi import APIRouter, HTTPException
+from dotenv import dotenv_values
+
+from urllib.parse import urlencode
+import asyncio
+import logging
+import os
+
+from mpd_client.mpd_library import MPDLibrary
+from routers.discogs import discogs
+from routers.lastfm import lastfm
+
+logging.basicConfig(
+    format='%(levelname)s:\t%(asctime)s - %(module)s: %(message)s', datefmt='%Y-%m-%d %H:%M:%S',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+config = {
+    **dotenv_values(".env"),  # load shared development variables
+    **os.environ,  # override loaded values with environment variables
+}
+
+library = MPDLibrary(host=config['HOST_MPD'])
+
+# Seconds each source gets before the page is returned without it
+TIMEOUT_LIBRARY = 5
+TIMEOUT_DISCOGS = 4
+TIMEOUT_LASTFM = 4
+
+router = APIRouter(
+    prefix='/artists',
+    tags=['Artists']
+)
+
+
+async def _from_source(name_source: str, coroutine, timeout: float, dict_errors: dict):
+    """The result of a source, or None with the reason in dict_errors when it failed or took too long"""
+    try:
+        return await asyncio.wait_for(coroutine, timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"{name_source} didn't respond within {timeout} seconds")
+        dict_errors[name_source] = f"No response within {timeout} seconds"
+    except Exception as e:
+        logger.error(f"Failed retrieving from {name_source}: {e}")
+        dict_errors[name_source] = str(e)
+    return None
+
+
+def _artist_image_url(name_artist: str) -> str:
+    # Fetches the image into Discogs' image cache, so the returned URL is served from disk
+    result = discogs.get_artist_image(name_artist)
+    if result['status_code'] != 200:
+        return None
+    return '/discogs/artist-image/?' + urlencode({'name_artist': name_artist})
+
+
+def _cover_url(album: dict) -> str:
+    # Cover art is looked up per directory, so the first file stands for the whole album
+    if len(album['files']) == 0:
+        return None
+    return '/library/cover-song/?' + urlencode({'file': album['files'][0]['file']})
+
+
+@router.get("/detail/")
+async def get_artist_detail(name_artist: str):
+    """Retrieve everything for an artist page at once: the albums with their cover art URLs, the Discogs image URL and the Last.fm bio
+
+    - **name_artist**: The exact name of the artist
+
+    The sources are retrieved at the same time, each with its own timeout. Sources that failed or took too long
+    are left empty and listed in 'errors' with the reason, so the page can be shown with what is there.
+    """
+    loop = asyncio.get_running_loop()
+    dict_errors = {}
+    lst_albums, image_url, bio = await asyncio.gather(
+        _from_source('library', library.get_artist_albums(name_artist=name_artist), TIMEOUT_LIBRARY, dict_errors),
+        _from_source('discogs', loop.run_in_executor(None, _artist_image_url, name_artist), TIMEOUT_DISCOGS, dict_errors),
+        _from_source('lastfm', loop.run_in_executor(None, lastfm.get_artist_bio, name_artist), TIMEOUT_LASTFM, dict_errors),
+    )
+    if lst_albums is not None and len(lst_albums) == 0:
+        raise HTTPException(status_code=404, detail=f"Artist not found: {name_artist}")
+    for album in lst_albums or []:
+        album['cover_url'] = _cover_url(album)
+    return {
+        'artist': name_artist,
+        'albums': lst_albums,
+        'image_url': image_url,
+        'bio': bio,
+        'errors': dict_errors,
+    }
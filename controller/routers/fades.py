@@ -0,0 +1,111 @@
+from fastapi import APIRouter, HTTPException
+from dotenv import dotenv_values
+
+from enum import Enum
+import os
+
+from mpd_client.mpd_server import MPDController
+from snapcast.snapcast_control import SnapcastError, get_snapcast_control, group_volume
+from utils.volume_ramp import MAX_STEPS_PER_SECOND, VolumeRamps
+
+config = {
+    **dotenv_values(".env"),  # load shared development variables
+    **os.environ,  # override loaded values with environment variables
+}
+
+controller = MPDController(host=config['HOST_MPD'])
+snapcontrol = get_snapcast_control(host=config['HOST_SNAPSERVER'])
+ramps = VolumeRamps()
+
+router = APIRouter(
+    prefix='/fades',
+    tags=['Volume fades']
+)
+
+class FadeTarget(str, Enum):
+    snapcast_client = 'snapcast_client'
+    snapcast_group = 'snapcast_group'
+    mpd = 'mpd'
+
+
+async def get_volume_functions(target: FadeTarget, id_target: str) -> tuple:
+    """The coroutine functions reading and setting the volume of a target, with a 404 when it doesn't exist"""
+    if target == FadeTarget.mpd:
+        if await controller.get_volume() is None:
+            raise HTTPException(status_code=409, detail="MPD has no mixer to set the volume of")
+        return controller.get_volume, controller.set_volume
+
+    try:
+        await snapcontrol.get_server()
+    except SnapcastError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    if target == FadeTarget.snapcast_client:
+        if snapcontrol.find_client(id_target) is None:
+            raise HTTPException(status_code=404, detail=f"Client {id_target} not found.")
+
+        async def get_client_volume():
+            return snapcontrol.find_client(id_target)['config']['volume']['percent']
+
+        async def set_client_volume(percent: int):
+            await snapcontrol.set_client_volume(id_target, percent=percent)
+
+        return get_client_volume, set_client_volume
+
+    if snapcontrol.find_group(id_target) is None:
+        raise HTTPException(status_code=404, detail=f"Group {id_target} not found.")
+
+    async def get_group_volume():
+        return group_volume(snapcontrol.find_group(id_target))
+
+    async def set_group_volume(percent: int):
+        await snapcontrol.set_group_volume(id_target, percent)
+
+    return get_group_volume, set_group_volume
+
+
+@router.get("/")
+async def list_fades():
+    """ List the volume fades that are running
+    """
+    return ramps.running
+
+@router.get("/start/")
+async def start_fade(target: FadeTarget, volume: int, duration: float, id_target: str = None,
+                     steps_per_second: float = 10):
+    """ Fade the volume of a multi-room client, a group of multi-room clients or MPD in the background
+
+    - **target**: What to fade: snapcast_client, snapcast_group or mpd
+    - **volume**: The volume to end at, expressed as a percentage between 0 and 100
+    - **duration**: The number of seconds the fade takes
+    - **id_target**: The id of the client or group, not used for MPD
+    - **steps_per_second**: How often the volume is changed during the fade, at most 20
+
+    A fade that is already running for the target is cancelled first.
+    """
+    if volume < 0 or volume > 100:
+        raise HTTPException(status_code=422,
+                            detail="Input should have a value from 0 to 100")
+    if duration < 0 or steps_per_second <= 0 or steps_per_second > MAX_STEPS_PER_SECOND:
+        raise HTTPException(status_code=422,
+                            detail=f"Duration can't be negative and steps per second should be above 0 and at most {MAX_STEPS_PER_SECOND}")
+    if target != FadeTarget.mpd and id_target is None:
+        raise HTTPException(status_code=422, detail=f"Provide the id_target of the {target.value}")
+    if target == FadeTarget.mpd:
+        id_target = None
+
+    get_volume, set_volume = await get_volume_functions(target, id_target)
+    info = ramps.start(target=target.value, id_target=id_target, get_volume=get_volume, set_volume=set_volume,
+                       volume=volume, duration=duration, steps_per_second=steps_per_second)
+    return info
+
+@router.get("/cancel/")
+async def cancel_fade(target: FadeTarget, id_target: str = None):
+    """ Stop a running fade, leaving the volume where the fade got to
+
+    - **target**: What is fading: snapcast_client, snapcast_group or mpd
+    - **id_target**: The id of the client or group, not used for MPD
+    """
+    info = ramps.cancel(target=target.value, id_target=None if target == FadeTarget.mpd else id_target)
+    if info is None:
+        raise HTTPException(status_code=404, detail="No fade is running for this target")
+    return info
@@ -0,0 +1,87 @@
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from dotenv import dotenv_values
+
+import asyncio
+import json
+import os
+
+from mpd_client.mpd_events import get_event_hub
+
+config = {
+    **dotenv_values(".env"),  # load shared development variables
+    **os.environ,  # override loaded values with environment variables
+}
+
+hub = get_event_hub(host=config['HOST_MPD'])
+
+KEEP_ALIVE = 15  # Seconds without events after which an SSE comment is sent, so proxies keep the stream open
+
+router = APIRouter(
+    prefix='/events',
+    tags=['MPD events']
+)
+
+
+async def _receive_until_disconnect(websocket: WebSocket):
+    # Messages from the client are not used, they are only read to notice it leaving
+    while True:
+        message = await websocket.receive()
+        if message['type'] == 'websocket.disconnect':
+            return
+
+
+@router.websocket("/ws/")
+async def websocket_events(websocket: WebSocket):
+    """
+    Pushes MPD changes as JSON messages. The first message has type 'state' with the state of all
+    subsystems, the following have type 'changed' with only the values that changed.
+    """
+    await websocket.accept()
+    task_receive = asyncio.create_task(_receive_until_disconnect(websocket))
+    try:
+        async with hub.subscription() as queue:
+            while True:
+                task_event = asyncio.create_task(queue.get())
+                done, _ = await asyncio.wait(
+                    [task_event, task_receive], return_when=asyncio.FIRST_COMPLETED
+                )
+                if task_receive in done:
+                    task_event.cancel()
+                    break
+                await websocket.send_json(jsonable_encoder(task_event.result()))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        task_receive.cancel()
+
+
+async def _server_sent_events():
+    async with hub.subscription() as queue:
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), KEEP_ALIVE)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            data = json.dumps(jsonable_encoder(event))
+            yield f"event: {event['type']}\ndata: {data}\n\n"
+
+
+@router.get("/stream/")
+async def server_sent_events():
+    """
+    Streams MPD changes as server-sent events. The first event is 'state' with the state of all
+    subsystems, the following are 'changed' events with only the values that changed.
+    """
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    return StreamingResponse(_server_sent_events(), media_type='text/event-stream', headers=headers)
+
+
+@router.get("/subscribers/")
+async def event_subscribers():
+    """
+    The number of clients receiving MPD changes, which all share a single MPD connection.
+    """
+    return {'subscribers': hub.qty_subscribers}
@@ -6,6 +6,7 @@ from enum import Enum
 from io import BytesIO
 import os
 
+from mpd_client.cover_thumbnails import THUMBNAIL_SIZES
 from mpd_client.mpd_library import MPDLibrary
 
 config = {
@@ -24,6 +25,19 @@ class TagTypeSearch(str, Enum):
     song = "song"
 
 
+class ThumbnailFormat(str, Enum):
+    jpeg = "jpeg"
+    webp = "webp"
+
+
+def check_thumbnail_size(size: int) -> None:
+    if size is not None and size not in THUMBNAIL_SIZES:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Thumbnail size should be one of {', '.join(str(size) for size in THUMBNAIL_SIZES)}",
+        )
+
+
 @router.get("/artists/")
 async def get_artists() -> list:
     """Get a list of all the artists"""
@@ -97,45 +111,115 @@ async def get_song_versions(
 
 @router.get("/search/{type}")
 async def search_music(
-    type: TagTypeSearch, search_string: str, starts_with: bool = None
+    type: TagTypeSearch, search_string: str, starts_with: bool = None, limit: int = None
 ):
     """Searching for artists, albums or songs
 
     - **type**: The type assets you're looking for
     - **search_string**: Part of the string you want to look for. The search is case-insensitive.
+    - **starts_with**: Only find assets that start with the search string.
+    - **limit**: The maximum number of songs the results are made up of.
     """
+    if limit is not None and limit < 1:
+        raise HTTPException(status_code=422, detail="The limit should be at least 1")
     lst_results = []
     lst_results = await library.search(
-        type=type.value, filter=search_string, starts_with=starts_with
+        type=type.value, filter=search_string, starts_with=starts_with, limit=limit
+    )
+    return lst_results
+
+
+@router.get("/search-fuzzy/{type}")
+async def search_music_fuzzy(type: TagTypeSearch, search_string: str, limit: int = 10):
+    """Ranking artists, albums or songs by their similarity to a search string, tolerating typos
+
+    - **type**: The type assets you're looking for
+    - **search_string**: The (possibly misspelled) name you're looking for. The search is case-insensitive.
+    - **limit**: The maximum number of results, ordered from most to least similar.
+    """
+    if limit < 1:
+        raise HTTPException(status_code=422, detail="The limit should be at least 1")
+    lst_results = await library.search_fuzzy(
+        type=type.value, filter=search_string, limit=limit
     )
     return lst_results
 
 
+@router.get("/autocomplete/")
+async def autocomplete(text: str, type: TagTypeSearch = None, limit: int = 10):
+    """Completing artist, album and song names while typing
+
+    - **text**: The start of the name, completion starts from the first character. Matching is case-insensitive.
+    - **type**: Only complete names of this type, if nothing is passed artists, albums and songs are completed.
+    - **limit**: The maximum number of completions for each type, the names with the most songs come first.
+    """
+    if limit < 1:
+        raise HTTPException(status_code=422, detail="The limit should be at least 1")
+    result = await library.autocomplete(
+        text=text, type=None if type is None else type.value, limit=limit
+    )
+    return result
+
+
+def cover_response(dict_image: dict) -> StreamingResponse:
+    """Streams cover art that is either complete ('image') or still being read from MPD ('stream')"""
+    headers = {"Content-Type": dict_image["image_format"]}
+    if "stream" in dict_image:
+        return StreamingResponse(dict_image["stream"], headers=headers)
+    return StreamingResponse(BytesIO(dict_image["image"]), headers=headers)
+
+
 @router.get("/cover-song/")
-async def get_song_cover(file: str):
+async def get_song_cover(
+    file: str, size: int = None, image_format: ThumbnailFormat = ThumbnailFormat.jpeg
+):
     """Retrieve the cover-art of a MPD file
 
     - **file**: The MPD file you want to retrieve the cover-art for
+    - **size**: Get a thumbnail that fits this size in pixels (64, 128, 256 or 512) instead of the original image
+    - **image_format**: The image format of the thumbnail
     """
-    dict_image = await library.get_cover_art(file)
-    headers = {"Content-Type": dict_image["image_format"]}
-    return StreamingResponse(BytesIO(dict_image["image"]), headers=headers)
+    check_thumbnail_size(size)
+    if size is None:
+        dict_image = await library.stream_cover_art(file)
+    else:
+        dict_image = await library.get_cover_art(
+            file, size=size, image_format=image_format.value
+        )
+    if dict_image is None:
+        raise HTTPException(status_code=404, detail=f"Cover art not found for '{file}'")
+    return cover_response(dict_image)
 
 
 @router.get("/cover-album/")
-async def get_album_cover(name_album_artist: str, name_album: str):
+async def get_album_cover(
+    name_album_artist: str,
+    name_album: str,
+    size: int = None,
+    image_format: ThumbnailFormat = ThumbnailFormat.jpeg,
+):
     """Retrieve the cover-art of a MPD file
 
     - **name_album_artist**: The album artist (if the album contains several artists, this is likely 'Various Artists')
     - **name_album**: Name of the album you're looking for.
+    - **size**: Get a thumbnail that fits this size in pixels (64, 128, 256 or 512) instead of the original image
+    - **image_format**: The image format of the thumbnail
     """
-    dict_image = await library.get_album_cover(
-        name_artist=name_album_artist, name_album=name_album
-    )
+    check_thumbnail_size(size)
+    if size is None:
+        dict_image = await library.stream_album_cover(
+            name_album_artist=name_album_artist, name_album=name_album
+        )
+    else:
+        dict_image = await library.get_album_cover(
+            name_album_artist=name_album_artist,
+            name_album=name_album,
+            size=size,
+            image_format=image_format.value,
+        )
     if dict_image is None:
         raise HTTPException(
             status_code=404,
             detail=f"Cover art not found for '{name_album_artist} - {name_album}'",
         )
-    headers = {"Content-Type": dict_image["image_format"]}
-    return StreamingResponse(BytesIO(dict_image["image"]), headers=headers)
+    return cover_response(dict_image)
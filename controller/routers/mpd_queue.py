@@ -1,11 +1,14 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 from fastapi.responses import StreamingResponse
 from dotenv import dotenv_values
+from mpd.asyncio import CommandError
 
-from io import BytesIO
 from pydantic import BaseModel
 from enum import Enum
-from typing import List
+from typing import List, Optional
+from urllib.parse import urlencode
+import hashlib
+import json
 import os
 
 from mpd_client.mpd_queue import MPDQueue
@@ -25,6 +28,10 @@ router = APIRouter(
     prefix='/queue',
     tags=['MPD queue']
 )
+# Routes of the queue that are served from the root
+router_root = APIRouter(
+    tags=['MPD queue']
+)
 
 class QueueControlType(str, Enum):
     play = 'play'
@@ -41,13 +48,31 @@ class QueueItems(BaseModel):
     start_playing: bool = False
     clear_queue: bool = False
     files: List[QueueItem]
+    version: Optional[int] = None
 
 @router.get("/")
-async def get_queue():
+async def get_queue(response: Response, start: int=None, end: int=None, version: int=None):
     """Retrieve the files in the queue with their complete information
+
+    - **start**: Position of the first file to retrieve, for retrieving a part of the queue.
+    - **end**: Position of the last file to retrieve.
+    - **version**: The playlist version of the parts retrieved before. When the queue changed since, a 409 is returned, so the parts can be synced first (see /queue/changes/).
+
+    The queue length and the playlist version the files belong to are returned in the X-Total-Count and X-Playlist-Version headers.
     """
-    lst_queue = await queue.get_queue()
-    return lst_queue
+    if start is None and end is None and version is None:
+        lst_queue = await queue.get_queue()
+        return lst_queue
+    if (start or 0) < 0 or (end is not None and end < (start or 0)):
+        raise HTTPException(status_code=422, detail='Start should be at least 0 and end at least start')
+    dict_window = await queue.get_queue_window(start=start or 0, end=end)
+    headers = {'X-Total-Count': str(dict_window['total']), 'X-Playlist-Version': str(dict_window['version'])}
+    if version is not None and version != dict_window['version']:
+        raise HTTPException(status_code=409,
+                            detail=f"The queue changed since version {version}",
+                            headers=headers)
+    response.headers.update(headers)
+    return dict_window['songs']
 
 @router.post("/add/")
 async def add_to_queue(items: QueueItems):
@@ -58,16 +83,85 @@ async def add_to_queue(items: QueueItems):
     - **start_playing**: indicates whether the playback should start at the added files.
     - **clear_queue**: indicates whether to empty the queue before adding the files.
     - **files**: A list dictionaries with relative MPD filenames to be added to the playlist.
+    - **version**: Return only the changes since this playlist version (see /queue/changes/) instead of the whole queue.
     """
-    position = items.at_position
-    first_round = True
-    for item in items.files:
-        first_round = items.start_playing and first_round
-        lst_queue = await queue.add_file(item.file, position=position, start_playing=first_round)
-        position = position + 1
-        first_round = False
+    try:
+        lst_queue = await queue.add_files(
+            files=[item.file for item in items.files],
+            position=items.at_position,
+            start_playing=items.start_playing,
+            clear=items.clear_queue,
+            version=items.version
+        )
+    except CommandError as e:
+        raise HTTPException(status_code=400, detail=f"The queue is left unchanged: {e}")
     return lst_queue
 
+class AssetType(str, Enum):
+    artist = 'artist'
+    album = 'album'
+    file = 'file'
+
+@router.post("/add-asset/")
+async def add_asset_to_queue(type_asset: AssetType, name: str, position: int=None,
+                             start_playing: bool=False, clear_queue: bool=False):
+    """
+    Add all songs of an artist or album, or a single file, to the play queue
+
+    - **type_asset**: The kind of asset to add: artist, album or file.
+    - **name**: The exact name of the artist or album, or the relative MPD filename.
+    - **position**: at which position in the queue the songs will be added, at the end when left out.
+    - **start_playing**: indicates whether the playback should start at the added songs.
+    - **clear_queue**: indicates whether to replace the songs in the queue, which are kept when nothing is found.
+
+    Returns the number of songs added and the queue position of the first.
+    """
+    if position is not None and position < 0:
+        raise HTTPException(status_code=422, detail='The position can\'t be negative')
+    dict_result = await queue.add(type_asset=type_asset.value, name=name, play=start_playing,
+                                  replace=clear_queue, position=position)
+    if 'error' in dict_result:
+        raise HTTPException(status_code=404, detail=dict_result['error'])
+    return dict_result
+
+@router.get("/search/")
+async def search_queue(artist: str=None, album: str=None, song: str=None, file: str=None,
+                       any_: str=Query(None, alias='any'), exact: bool=False):
+    """
+    Find songs in the queue, returned with their position and id in the queue
+
+    - **artist**: (Part of) the artist name.
+    - **album**: (Part of) the album name.
+    - **song**: (Part of) the song title.
+    - **file**: (Part of) the file name.
+    - **any**: (Part of) any of the song's tags.
+    - **exact**: Only match complete, case-sensitive values.
+
+    Songs should match all the given values.
+    """
+    dict_filters = {'artist': artist, 'album': album, 'song': song, 'file': file, 'any': any_}
+    dict_filters = {tag: value for tag, value in dict_filters.items() if value is not None}
+    if len(dict_filters) == 0:
+        raise HTTPException(status_code=422, detail='Provide at least one of artist, album, song, file or any')
+    lst_songs = await queue.search(filters=dict_filters, exact=exact)
+    return lst_songs
+
+@router.get("/changes/")
+async def get_queue_changes(version: int, with_info: bool=False):
+    """
+    Changes to the queue since a playlist version, to keep a copy of a large queue in sync without retrieving all of it
+
+    - **version**: The playlist version of your copy of the queue, as reported by a previous call or the status' 'playlist'.
+    - **with_info**: Return changed songs with all their information instead of only their position and id.
+
+    Store the returned 'version' for the next call. Inserted and moved songs are reported at their new position,
+    songs beyond 'length' were removed. When 'reset' is set MPD was restarted, and all songs are reported.
+    """
+    if version < 0:
+        raise HTTPException(status_code=422, detail='The version can\'t be negative')
+    dict_changes = await queue.get_changes(version=version, with_info=with_info)
+    return dict_changes
+
 @router.get("/current-song/")
 async def get_current_song():
     """Retrieve information about the currently playing song
@@ -75,6 +169,31 @@ async def get_current_song():
     current_song = await queue.current_song()
     return current_song
 
+@router_root.get("/now-playing")
+@router.get("/now-playing/", deprecated=True)
+async def get_now_playing(request: Request, response: Response):
+    """Retrieve everything for a player screen at once: the status, the current song, the next song and the URL of the current song's cover art
+
+    The response has an ETag, send it back in the If-None-Match header to get a 304 when nothing changed. The
+    elapsed time doesn't count as a change, clients move it forward themselves while the state is 'play'.
+
+    Served at /now-playing, /queue/now-playing/ is kept for clients that already use it.
+    """
+    dict_now_playing = await queue.now_playing()
+    current_song = dict_now_playing['current_song']
+    dict_now_playing['cover_url'] = (
+        '/library/cover-song/?' + urlencode({'file': current_song['file']}) if 'file' in current_song else None
+    )
+    dict_version = {key: value for key, value in dict_now_playing['status'].items()
+                    if key not in ['elapsed', 'time', 'bitrate']}
+    dict_version['current_song'] = current_song.get('id')
+    dict_version['next_song'] = dict_now_playing['next_song'].get('id')
+    etag = '"' + hashlib.sha1(json.dumps(dict_version, sort_keys=True).encode()).hexdigest() + '"'
+    if request.headers.get('if-none-match') == etag:
+        return Response(status_code=304, headers={'ETag': etag})
+    response.headers['ETag'] = etag
+    return dict_now_playing
+
 @router.get("/play-time/")
 async def seek_position_in_current_song(time_seconds: str):
     """
@@ -104,9 +223,13 @@ async def get_current_song_cover():
     """ Retrieve the cover art of the currently playing file.
     """
     current_song = await queue.current_song()
-    dict_image = await library.get_cover_art(current_song['file'])
+    if 'file' not in current_song:
+        raise HTTPException(status_code=404, detail="No song is playing")
+    dict_image = await library.stream_cover_art(current_song['file'])
+    if dict_image is None:
+        raise HTTPException(status_code=404, detail=f"Cover art not found for '{current_song['file']}'")
     headers = {"Content-Type": dict_image['image_format']}
-    return StreamingResponse(BytesIO(dict_image['image']), headers=headers)
+    return StreamingResponse(dict_image['stream'], headers=headers)
 
 @router.get("/control/")
 async def execute_queue_control(action: QueueControlType):
@@ -120,13 +243,28 @@ async def execute_queue_control(action: QueueControlType):
     return control_status['state']
 
 @router.get("/move/")
-async def move_queue_items(start: int, end: int, to: int):
-    playlist = await queue.move_items(start=start, end=end, to=to)
+async def move_queue_items(start: int, end: int, to: int, version: int=None):
+    """
+    Move songs within the queue
+
+    - **start**: Position of the first song to move.
+    - **end**: Position of the last song to move.
+    - **to**: The position the songs are moved to.
+    - **version**: Return only the changes since this playlist version (see /queue/changes/) instead of the whole queue.
+    """
+    playlist = await queue.move_items(start=start, end=end, to=to, version=version)
     return playlist
 
 @router.get("/delete/")
-async def delete_queue_items(start: int, end: int):
-    playlist = await queue.delete_items(start=start, end=end)
+async def delete_queue_items(start: int, end: int, version: int=None):
+    """
+    Remove songs from the queue
+
+    - **start**: Position of the first song to remove.
+    - **end**: Position of the last song to remove.
+    - **version**: Return only the changes since this playlist version (see /queue/changes/) instead of the whole queue.
+    """
+    playlist = await queue.delete_items(start=start, end=end, version=version)
     return playlist
 
 @router.get("/clear/")
@@ -49,6 +49,14 @@ async def server_statistics():
     server_stats = await mpd.get_statistics()
     return server_stats
 
+@router.get('/connection-pool/')
+async def connection_pool_statistics():
+    """
+    Usage of the MPD connection pool shared by all routers, with the time requests waited for a connection.
+    """
+    pool_stats = mpd.get_pool_statistics()
+    return pool_stats
+
 @router.get("/update-db/")
 async def update_mpd_library():
     """
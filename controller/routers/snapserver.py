@@ -4,42 +4,68 @@ from dotenv import dotenv_values
 import os
 from pydantic import PositiveInt
 
-from snapcast.snapcast import SnapcastServer
+from snapcast.snapcast_control import SnapcastError, client_info, get_snapcast_control, group_info
 
 config = {
     **dotenv_values(".env"),  # load shared development variables
     **os.environ,  # override loaded values with environment variables
 }
 
-snapserver = SnapcastServer(host=config['HOST_SNAPSERVER'])
+snapcontrol = get_snapcast_control(host=config['HOST_SNAPSERVER'])
 
 router = APIRouter(
     prefix='/snapserver',
     tags=['Snapcast server']
 )
 
+async def get_server() -> dict:
+    """The Snapcast server model, kept in memory by the control connection"""
+    try:
+        return await snapcontrol.get_server()
+    except SnapcastError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+async def get_group(id_group: str) -> dict:
+    await get_server()
+    group = snapcontrol.find_group(id_group)
+    if group is None:
+        raise HTTPException(status_code=404, detail=f"Group {id_group} not found.")
+    return group
+
+async def get_client(id_group: str, id_client: str) -> dict:
+    group = await get_group(id_group)
+    client = snapcontrol.find_client(id_client)
+    if client is None or snapcontrol.find_client_group(id_client) is not group:
+        raise HTTPException(status_code=404, detail=f"Client {id_client} within group {id_group} not found.")
+    return client
+
+async def execute(coroutine):
+    """Awaits a Snapcast request, with a 503 when Snapcast doesn't respond in time or returns an error"""
+    try:
+        return await coroutine
+    except SnapcastError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
 @router.get("/status/")
 async def get_server_status():
     """ Status of the multi-room streamer
     """
-    status = snapserver.status
-    del status['groups']
+    server = await get_server()
+    status = {key: value for key, value in server.items() if key != 'groups'}
     return status
 
 @router.get("/groups/")
 async def get_info_groups():
     """ List groups of multi-room clients with info
     """
-    lst_groups = [group.info for group in snapserver.groups]
+    server = await get_server()
+    lst_groups = [group_info(group) for group in server['groups']]
     return lst_groups
 
 @router.get("/group/")
 async def get_group_info(id_group: str):
-    group = next((group for group in snapserver.groups if group.id_group == id_group), None)
-    if group is None:
-        raise HTTPException(status_code=404, detail=f"Group {id_group} not found.")
-
-    return group.info
+    group = await get_group(id_group)
+    return group_info(group)
 
 @router.get("/group/volume/")
 async def set_group_volume(id_group: str, volume: int):
@@ -52,13 +78,9 @@ async def set_group_volume(id_group: str, volume: int):
         raise HTTPException(status_code=422,
                             detail="Input should have a value from 0 to 100")
 
-    group = next((group for group in snapserver.groups if group.id_group == id_group), None)
-    if group is None:
-        raise HTTPException(status_code=404, detail=f"Group {id_group} not found.")
-
-    group.volume = volume
-
-    return group.info
+    await get_group(id_group)
+    await execute(snapcontrol.set_group_volume(id_group, volume))
+    return group_info(await get_group(id_group))
 
 @router.get("/group/mute/")
 async def toggle_group_mute(id_group: str):
@@ -66,21 +88,16 @@ async def toggle_group_mute(id_group: str):
 
     - **id_group** - The id of a group of clients
     """
-    group = next((group for group in snapserver.groups if group.id_group == id_group), None)
-    if group is None:
-        raise HTTPException(status_code=404, detail=f"Group {id_group} not found.")
-
-    return group.toggle_mute()
+    group = await get_group(id_group)
+    result = await execute(snapcontrol.set_group_mute(id_group, not group['muted']))
+    return result
 
 @router.get("/clients/")
 async def list_clients(id_group: str):
     """ List multi-room clients
     """
-    group = next((group for group in snapserver.groups if group.id_group == id_group), None)
-    if group is None:
-        raise HTTPException(status_code=404, detail=f"Group {id_group} not found.")
-
-    lst_info = [client.info for client in group.clients]
+    group = await get_group(id_group)
+    lst_info = [client_info(client) for client in group['clients']]
 
     return lst_info
 
@@ -96,16 +113,9 @@ async def set_client_volume(id_group: str, id_client: str, volume: int):
         raise HTTPException(status_code=422,
                             detail="Input should have a value from 0 to 100")
 
-    group = next((group for group in snapserver.groups if group.id_group == id_group), None)
-    if group is None:
-        raise HTTPException(status_code=404, detail=f"Group {id_group} not found.")
-
-    client = next((client for client in group.clients if client.id_client == id_client), None)
-    if client is None:
-        raise HTTPException(status_code=404, detail=f"Client {id_client} within group {id_group} not found.")
-
-    client.volume = volume
-    return client.info
+    await get_client(id_group, id_client)
+    await execute(snapcontrol.set_client_volume(id_client, percent=volume, muted=False))
+    return client_info(await get_client(id_group, id_client))
 
 
 @router.get("/client/mute/")
@@ -115,14 +125,7 @@ async def toggle_client_mute(id_group: str, id_client: str):
     - **id_group**: The id of a group where the client resides in
     - **id_client**: The id of a client
     """
-    group = next((group for group in snapserver.groups if group.id_group == id_group), None)
-    if group is None:
-        raise HTTPException(status_code=404, detail=f"Group {id_group} not found.")
-
-    client = next((client for client in group.clients if client.id_client == id_client), None)
-    if client is None:
-        raise HTTPException(status_code=404, detail=f"Client {id_client} within group {id_group} not found.")
-
-    client.toggle_mute()
-    return client.info
+    client = await get_client(id_group, id_client)
+    await execute(snapcontrol.set_client_volume(id_client, muted=not client['config']['volume']['muted']))
+    return client_info(await get_client(id_group, id_client))
 
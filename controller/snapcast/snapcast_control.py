@@ -0,0 +1,424 @@
+import asyncio
+import copy
+import json
+import logging
+from datetime import datetime
+
+from utils.shared_per_server import shared_per_server
+
+logging.basicConfig(
+    format="%(levelname)s:\t%(asctime)s - %(module)s: %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+    level=logging.INFO,
+)
+logger = logging.getLogger(__name__)
+
+TIMEOUT_REQUEST = 5  # Seconds a request waits for Snapcast's response
+TIMEOUT_SYNC = 3  # Seconds reads wait for the server model while (re)connecting
+RECONNECT_DELAY = 5  # Seconds between attempts to restore the connection
+VOLUME_COALESCE_DELAY = 0.05  # Seconds group volumes are gathered before only the latest is applied
+READ_LIMIT = 2 ** 24  # Bytes a single message may take, the server status of a large setup exceeds the default 64 KiB
+
+
+class SnapcastError(Exception):
+    """Snapcast couldn't be reached in time, or it returned an error"""
+
+
+def client_info(client: dict) -> dict:
+    """A copy of a client's status, with the time it was last seen as readable text"""
+    info = copy.deepcopy(client)
+    info["lastSeen"] = datetime.utcfromtimestamp(info["lastSeen"]["sec"]).strftime(
+        "%Y-%m-%d %H:%M:%S"
+    )
+    return info
+
+
+def group_volume(group: dict) -> int:
+    """The volume of a group, the average of its clients' volumes"""
+    lst_volumes = [client["config"]["volume"]["percent"] for client in group["clients"]]
+    if len(lst_volumes) == 0:
+        return 0
+    return int(sum(lst_volumes) / len(lst_volumes))
+
+
+def group_info(group: dict) -> dict:
+    """A group's name, stream, volume and its clients' status"""
+    info = {key: group[key] for key in ["id", "name", "stream_id"]}
+    info["volume"] = {"muted": group["muted"], "percent": group_volume(group)}
+    info["clients"] = [client_info(client) for client in group["clients"]]
+    return info
+
+
+class SnapcastControl:
+    """Keeps a single JSON-RPC connection to the Snapcast server's control port.
+
+    The complete server model (groups, clients and streams) is retrieved once with Server.GetStatus and kept
+    current with the notifications Snapcast sends for every change, so reading it costs no requests. After the
+    connection is lost the model is retrieved again, since notifications might have been missed in the meantime.
+    """
+
+    def __init__(self, host: str, port: int = 1705) -> None:
+        self.host = host
+        self.port = port
+        self._writer: asyncio.StreamWriter = None
+        self._id_request = 0
+        self._requests: dict = {}  # Request id -> future that receives the response
+        self._server: dict = None
+        # Indexes of the server model by id, rebuilt whenever the model's structure changes
+        self._groups: dict = {}
+        self._clients: dict = {}
+        self._client_groups: dict = {}  # Client id -> id of the group it is in
+        self._streams: dict = {}
+        self._event_synced: asyncio.Event = None
+        self._task_connection: asyncio.Task = None
+        self._group_volumes: dict = {}  # Group id -> latest volume requested, waiting to be applied
+        self._tasks_group_volume: dict = {}  # Group id -> task applying its requested volumes
+        self._notifications = {
+            "Client.OnConnect": self._on_client_update,
+            "Client.OnDisconnect": self._on_client_update,
+            "Client.OnVolumeChanged": self._on_client_config("volume"),
+            "Client.OnLatencyChanged": self._on_client_config("latency"),
+            "Client.OnNameChanged": self._on_client_config("name"),
+            "Group.OnMute": self._on_group_change("muted", "mute"),
+            "Group.OnStreamChanged": self._on_group_change("stream_id", "stream_id"),
+            "Group.OnNameChanged": self._on_group_change("name", "name"),
+            "Stream.OnUpdate": self._on_stream_update,
+            "Stream.OnProperties": self._on_stream_properties,
+            "Server.OnUpdate": self._on_server_update,
+        }
+
+    @property
+    def is_connected(self) -> bool:
+        return self._event_synced is not None and self._event_synced.is_set()
+
+    def start(self) -> None:
+        """Connects to Snapcast in the background, and reconnects when the connection is lost"""
+        if self._event_synced is None:
+            self._event_synced = asyncio.Event()
+        if self._task_connection is None or self._task_connection.done():
+            self._task_connection = asyncio.create_task(self._maintain())
+
+    async def request(self, method: str, params: dict = None, timeout: float = TIMEOUT_REQUEST):
+        """Calls a JSON-RPC method of the Snapcast server
+
+        Args:
+            method (str): The method, like 'Client.SetVolume'
+            params (dict, optional): The method's parameters
+            timeout (float, optional): Seconds to wait for the response. Defaults to TIMEOUT_REQUEST.
+
+        Raises:
+            SnapcastError: When Snapcast isn't connected, doesn't respond in time or returns an error
+
+        Returns:
+            The result of the method
+        """
+        lst_results = await self._send([(method, params)], timeout=timeout, is_batch=False)
+        return lst_results[0]
+
+    async def request_batch(self, lst_calls: list, timeout: float = TIMEOUT_REQUEST) -> list:
+        """Calls several JSON-RPC methods of the Snapcast server as a single batch, answered all at once
+
+        Args:
+            lst_calls (list): (method, parameters) tuples
+            timeout (float, optional): Seconds to wait for the responses. Defaults to TIMEOUT_REQUEST.
+
+        Raises:
+            SnapcastError: When Snapcast isn't connected, doesn't respond in time or returns an error for any of the calls
+
+        Returns:
+            list: The results of the methods, in the order of the calls
+        """
+        return await self._send(lst_calls, timeout=timeout, is_batch=True)
+
+    async def _send(self, lst_calls: list, timeout: float, is_batch: bool) -> list:
+        if self._writer is None:
+            raise SnapcastError(f"Not connected to the Snapcast server on {self.host}:{self.port}")
+        loop = asyncio.get_running_loop()
+        lst_payloads = []
+        for method, params in lst_calls:
+            self._id_request += 1
+            payload = {"id": self._id_request, "jsonrpc": "2.0", "method": method}
+            if params is not None:
+                payload["params"] = params
+            lst_payloads.append(payload)
+            self._requests[payload["id"]] = loop.create_future()
+        lst_futures = [self._requests[payload["id"]] for payload in lst_payloads]
+        methods = ", ".join(method for method, _ in lst_calls)
+        try:
+            message = lst_payloads if is_batch else lst_payloads[0]
+            self._writer.write((json.dumps(message) + "\r\n").encode())
+            lst_responses = await asyncio.wait_for(asyncio.gather(*lst_futures), timeout)
+        except asyncio.TimeoutError:
+            raise SnapcastError(f"No response to '{methods}' within {timeout} seconds")
+        finally:
+            for payload in lst_payloads:
+                self._requests.pop(payload["id"], None)
+        lst_errors = [
+            (payload, response["error"]) for payload, response in zip(lst_payloads, lst_responses) if "error" in response
+        ]
+        for payload, error in lst_errors:
+            logger.error(
+                f"Could not execute method '{payload['method']}' with parameters {payload.get('params')}: {error}"
+            )
+        if len(lst_errors) > 0:
+            if is_batch and len(lst_errors) < len(lst_payloads):
+                # The calls that did succeed aren't notified back, so the model is brought up to date as a whole
+                asyncio.create_task(self._resynchronize())
+            error = lst_errors[0][1]
+            raise SnapcastError(error.get("message", str(error)))
+        return [response["result"] for response in lst_responses]
+
+    async def get_server(self) -> dict:
+        """The server model as returned by Server.GetStatus, kept current with Snapcast's notifications
+
+        Raises:
+            SnapcastError: When there is no connection with Snapcast
+
+        Returns:
+            dict: The server model, which shouldn't be changed by the caller
+        """
+        self.start()
+        try:
+            await asyncio.wait_for(self._event_synced.wait(), TIMEOUT_SYNC)
+        except asyncio.TimeoutError:
+            raise SnapcastError(f"Not connected to the Snapcast server on {self.host}:{self.port}")
+        return self._server
+
+    def find_group(self, id_group: str) -> dict:
+        """A group in the server model, or None when it doesn't exist"""
+        return self._groups.get(id_group)
+
+    def find_client(self, id_client: str) -> dict:
+        """A client in the server model, or None when it doesn't exist"""
+        return self._clients.get(id_client)
+
+    def find_client_group(self, id_client: str) -> dict:
+        """The group a client is in, or None when the client doesn't exist"""
+        return self._groups.get(self._client_groups.get(id_client))
+
+    def find_stream(self, id_stream: str) -> dict:
+        """A stream in the server model, or None when it doesn't exist"""
+        return self._streams.get(id_stream)
+
+    def _set_server(self, server: dict) -> None:
+        self._server = server
+        self._groups = {group["id"]: group for group in server["groups"]}
+        self._clients = {client["id"]: client for group in server["groups"] for client in group["clients"]}
+        self._client_groups = {client["id"]: group["id"] for group in server["groups"] for client in group["clients"]}
+        self._streams = {stream["id"]: stream for stream in server["streams"]}
+
+    async def set_client_volume(self, id_client: str, percent: int = None, muted: bool = None) -> dict:
+        """Sets the volume and/or mute of a client, keeping the value that isn't passed
+
+        Args:
+            id_client (str): The id of the client
+            percent (int, optional): The volume between 0 and 100
+            muted (bool, optional): Whether the client is muted
+
+        Returns:
+            dict: The client's volume after the change
+        """
+        client = self.find_client(id_client)
+        volume = dict(client["config"]["volume"]) if client is not None else {"muted": False, "percent": 0}
+        if percent is not None:
+            volume["percent"] = percent
+        if muted is not None:
+            volume["muted"] = muted
+        result = await self.request("Client.SetVolume", {"id": id_client, "volume": volume})
+        # Snapcast doesn't notify the connection that made the change itself
+        self._notify("Client.OnVolumeChanged", {"id": id_client, "volume": result["volume"]})
+        return result["volume"]
+
+    async def set_group_mute(self, id_group: str, mute: bool) -> dict:
+        """Mutes or unmutes a group
+
+        Args:
+            id_group (str): The id of the group
+            mute (bool): Whether the group is muted
+
+        Returns:
+            dict: The group's mute after the change
+        """
+        result = await self.request("Group.SetMute", {"id": id_group, "mute": mute})
+        self._notify("Group.OnMute", {"id": id_group, "mute": result["mute"]})
+        return result
+
+    async def set_group_volume(self, id_group: str, percent: int) -> None:
+        """Sets the volume of a group by moving all its clients' volumes by the same amount, and unmutes it
+
+        Volumes set in quick succession, like while dragging a slider, are coalesced: only the latest volume
+        requested for the group is applied and all callers return once it is.
+
+        Args:
+            id_group (str): The id of the group
+            percent (int): The group volume between 0 and 100
+        """
+        self._group_volumes[id_group] = percent
+        task = self._tasks_group_volume.get(id_group)
+        if task is None or task.done():
+            task = asyncio.create_task(self._apply_group_volume(id_group))
+            self._tasks_group_volume[id_group] = task
+            task.add_done_callback(lambda task_done: self._discard_group_volume_task(id_group, task_done))
+        # Shielded, so a caller that leaves doesn't cancel the volume the other callers wait for
+        await asyncio.shield(task)
+
+    def _discard_group_volume_task(self, id_group: str, task: asyncio.Task) -> None:
+        # A finished task may already be replaced by a new one for the same group, which is kept
+        if self._tasks_group_volume.get(id_group) is task:
+            del self._tasks_group_volume[id_group]
+
+    async def _apply_group_volume(self, id_group: str) -> None:
+        await asyncio.sleep(VOLUME_COALESCE_DELAY)
+        while id_group in self._group_volumes:
+            percent = self._group_volumes.pop(id_group)
+            group = self.find_group(id_group)
+            if group is None:
+                raise SnapcastError(f"Group {id_group} not found")
+            # All client volumes and the unmute are computed from the same state, and sent as a single batch
+            volume_change = percent - group_volume(group)
+            lst_calls = [
+                (
+                    "Client.SetVolume",
+                    {
+                        "id": client["id"],
+                        "volume": {
+                            "muted": False,
+                            "percent": min(max(client["config"]["volume"]["percent"] + volume_change, 0), 100),
+                        },
+                    },
+                )
+                for client in group["clients"]
+            ]
+            lst_calls.append(("Group.SetMute", {"id": id_group, "mute": False}))
+            lst_results = await self.request_batch(lst_calls)
+            for (_, params), result in zip(lst_calls[:-1], lst_results[:-1]):
+                self._notify("Client.OnVolumeChanged", {"id": params["id"], "volume": result["volume"]})
+            self._notify("Group.OnMute", {"id": id_group, "mute": lst_results[-1]["mute"]})
+
+    async def _maintain(self) -> None:
+        while True:
+            task_read = None
+            try:
+                reader, self._writer = await asyncio.open_connection(self.host, self.port, limit=READ_LIMIT)
+                task_read = asyncio.create_task(self._read(reader))
+                await self._synchronize()
+                logger.info(f"Connected to the Snapcast server on {self.host}:{self.port}")
+                await task_read
+            except (OSError, ValueError, asyncio.LimitOverrunError, SnapcastError) as e:
+                # A message exceeding READ_LIMIT can't be read past, so the connection is restored instead
+                logger.error(f"Lost connection to the Snapcast server on {self.host}:{self.port}: {e}")
+            finally:
+                self._event_synced.clear()
+                if task_read is not None:
+                    task_read.cancel()
+                if self._writer is not None:
+                    self._writer.close()
+                    self._writer = None
+                for future in self._requests.values():
+                    if not future.done():
+                        future.set_exception(SnapcastError("Lost connection to the Snapcast server"))
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    async def _synchronize(self) -> None:
+        result = await self.request("Server.GetStatus")
+        self._set_server(result["server"])
+        self._event_synced.set()
+
+    async def _read(self, reader: asyncio.StreamReader) -> None:
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            try:
+                message = json.loads(line)
+            except ValueError:
+                logger.error(f"Received invalid JSON from Snapcast: {line[:100]}")
+                continue
+            # Batch requests are answered with an array of responses
+            for item in message if isinstance(message, list) else [message]:
+                if "id" in item and item["id"] in self._requests:
+                    future = self._requests[item["id"]]
+                    if not future.done():
+                        future.set_result(item)
+                elif "method" in item:
+                    try:
+                        self._notify(item["method"], item.get("params", {}))
+                    except Exception:
+                        # A notification that doesn't fit the model mustn't stop reading the connection
+                        logger.exception(f"Failed applying Snapcast notification '{item['method']}'")
+                        asyncio.create_task(self._resynchronize())
+
+    def _notify(self, method: str, params: dict) -> None:
+        if self._server is None:
+            return
+        handler = self._notifications.get(method)
+        if handler is None or not handler(params):
+            # Changes that can't be applied to the model are resolved by retrieving all of it
+            logger.info(f"Retrieving the Snapcast server status after notification '{method}'")
+            asyncio.create_task(self._resynchronize())
+
+    async def _resynchronize(self) -> None:
+        try:
+            await self._synchronize()
+        except SnapcastError as e:
+            logger.error(f"Could not retrieve the Snapcast server status: {e}")
+
+    def _on_client_update(self, params: dict) -> bool:
+        client = self.find_client(params["id"])
+        if client is None:
+            return False
+        client.clear()
+        client.update(params["client"])
+        return True
+
+    def _on_client_config(self, key: str):
+        def handler(params: dict) -> bool:
+            client = self.find_client(params["id"])
+            if client is None:
+                return False
+            client["config"][key] = params[key]
+            return True
+        return handler
+
+    def _on_group_change(self, key: str, key_params: str):
+        def handler(params: dict) -> bool:
+            group = self.find_group(params["id"])
+            if group is None:
+                return False
+            group[key] = params[key_params]
+            return True
+        return handler
+
+    def _on_stream_update(self, params: dict) -> bool:
+        stream = self.find_stream(params["id"])
+        if stream is None:
+            return False
+        # Changed in place, so the stream list and the index keep sharing it
+        stream.clear()
+        stream.update(params["stream"])
+        return True
+
+    def _on_stream_properties(self, params: dict) -> bool:
+        stream = self.find_stream(params["id"])
+        if stream is None:
+            return False
+        stream["properties"] = params["properties"]
+        return True
+
+    def _on_server_update(self, params: dict) -> bool:
+        self._set_server(params["server"])
+        return True
+
+
+@shared_per_server
+def get_snapcast_control(host: str, port: int = 1705) -> SnapcastControl:
+    """The control connection shared by everything that uses a Snapcast server
+
+    Args:
+        host (str): Snapcast server host
+        port (int, optional): Snapcast's JSON-RPC control port. Defaults to 1705.
+
+    Returns:
+        SnapcastControl: The control connection of the server
+    """
+    return SnapcastControl(host=host, port=port)
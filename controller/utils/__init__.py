@@ -1 +1,3 @@
 from utils.secrets_yaml import SecretsYAML
+from utils.volume_ramp import VolumeRamps
+from utils.shared_per_server import shared_per_server
@@ -0,0 +1,32 @@
+import functools
+import inspect
+
+
+def shared_per_server(factory):
+    """Makes a factory of server objects return one shared object per server
+
+    The decorated factory takes the server's host and port, and is only called the first time a server is asked for.
+    Later calls for the same host and port, with the port as an int or a string, return the object made then.
+
+    Example:
+        @shared_per_server
+        def get_pool(host: str, port: int = 6600) -> MPDConnectionPool:
+            return MPDConnectionPool(host=host, port=port)
+
+    Args:
+        factory (callable): Makes the object for a server from host and port arguments
+
+    Returns:
+        callable: The factory, returning the shared objects
+    """
+    default_port = inspect.signature(factory).parameters["port"].default
+    dict_shared = {}
+
+    @functools.wraps(factory)
+    def get_shared(host: str, port: int = default_port):
+        key = (host, int(port))
+        if key not in dict_shared:
+            dict_shared[key] = factory(host=host, port=port)
+        return dict_shared[key]
+
+    return get_shared
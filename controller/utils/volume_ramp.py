@@ -0,0 +1,114 @@
+import asyncio
+import itertools
+import logging
+import time
+
+logging.basicConfig(
+    format='%(levelname)s:\t%(asctime)s - %(module)s: %(message)s', datefmt='%Y-%m-%d %H:%M:%S',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+MAX_STEPS_PER_SECOND = 20  # Upper bound on the volume changes a ramp sends to its target each second
+
+
+class VolumeRamps:
+    """Runs volume ramps (fades) as background tasks, at most one per target.
+
+    A ramp moves a volume from its current value to a target value over a duration, in steps that are scheduled
+    at a fixed rate. Steps that wouldn't change the (whole percent) volume are skipped, and so are steps that are
+    overdue because the target responds slower than the step rate. A ramp therefore sends at most one change per
+    step and never more than the volume difference. Starting a ramp on a target that is already ramping cancels
+    the running ramp first.
+    """
+
+    def __init__(self) -> None:
+        self._ramps: dict = {}  # Target key -> (task, ramp info)
+        self._ids = itertools.count(1)
+
+    @property
+    def running(self) -> list:
+        """Info on the ramps that are running"""
+        return [dict(info) for _, info in self._ramps.values()]
+
+    def start(self, target: str, id_target: str, get_volume, set_volume,
+              volume: int, duration: float, steps_per_second: float) -> dict:
+        """Starts ramping the volume of a target
+
+        Args:
+            target (str): The kind of target, like 'snapcast_group'
+            id_target (str): The id of the target within its kind, None for targets of which there is only one
+            get_volume (callable): Coroutine function returning the current volume
+            set_volume (callable): Coroutine function setting a volume
+            volume (int): The volume to end at, between 0 and 100
+            duration (float): Seconds the ramp takes
+            steps_per_second (float): The number of volume changes per second, at most MAX_STEPS_PER_SECOND
+
+        Returns:
+            dict: Info on the started ramp
+        """
+        self.cancel(target, id_target)
+        info = {
+            "id_ramp": next(self._ids),
+            "target": target,
+            "id_target": id_target,
+            "volume_start": None,
+            "volume_end": volume,
+            "volume": None,
+            "duration": duration,
+            "steps_per_second": min(steps_per_second, MAX_STEPS_PER_SECOND),
+            "started": time.time(),
+        }
+        task = asyncio.create_task(self._ramp(info, get_volume, set_volume))
+        key = (target, id_target)
+        self._ramps[key] = (task, info)
+        task.add_done_callback(lambda task: self._forget(key, task))
+        return dict(info)
+
+    def cancel(self, target: str, id_target: str = None) -> dict:
+        """Stops a running ramp, leaving the volume where it got to
+
+        Args:
+            target (str): The kind of target
+            id_target (str, optional): The id of the target within its kind
+
+        Returns:
+            dict: Info on the cancelled ramp, None when no ramp was running for the target
+        """
+        ramp = self._ramps.pop((target, id_target), None)
+        if ramp is None:
+            return None
+        task, info = ramp
+        task.cancel()
+        logger.info(f"Cancelled the volume ramp of {target} {id_target or ''} at volume {info['volume']}")
+        return dict(info)
+
+    def _forget(self, key: tuple, task: asyncio.Task) -> None:
+        # Only when the finished task is still the ramp of its target, a replacement might have been started
+        if key in self._ramps and self._ramps[key][0] is task:
+            del self._ramps[key]
+
+    async def _ramp(self, info: dict, get_volume, set_volume) -> None:
+        try:
+            volume_start = await get_volume()
+            info["volume_start"] = info["volume"] = volume_start
+            qty_steps = max(1, round(info["duration"] * info["steps_per_second"]))
+            loop = asyncio.get_running_loop()
+            time_start = loop.time()
+            for step in range(1, qty_steps + 1):
+                # Scheduled from the start, so time spent setting the volume doesn't stretch the ramp; when setting
+                # the volume is slower than the step rate, the steps that are already overdue are skipped
+                delay = time_start + step * info["duration"] / qty_steps - loop.time()
+                if delay < 0 and step < qty_steps:
+                    continue
+                await asyncio.sleep(max(0, delay))
+                volume = round(volume_start + (info["volume_end"] - volume_start) * step / qty_steps)
+                if volume != info["volume"]:
+                    # Set before awaiting, a cancel during the request still reports the volume that was sent
+                    info["volume"] = volume
+                    await set_volume(volume)
+            logger.info(f"Volume ramp of {info['target']} {info['id_target'] or ''} reached {info['volume']}")
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception(f"Volume ramp of {info['target']} {info['id_target'] or ''} failed")